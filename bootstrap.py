@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import time
+import traceback
+
+from ready_gate import ReadyGate
+
+"""
+Scheduler for the loaders run when the bot becomes ready.
+
+Modules register their loaders with
+    bot.objects["bootstrap"].add(name, loader, after=[...])
+instead of as ready after-events.
+Loaders run concurrently once the bot is ready, each after the loaders it depends on have finished.
+A loader may return the number of rows it loaded, which is logged with its duration.
+
+Features relying on the objects built by a loader wait for that loader alone, through wait or defer.
+Commands declare the loaders they rely on with the loaders keyword of their command or command handler.
+"""
+
+
+class Loader:
+    def __init__(self, name, func, after, backlog):
+        self.name = name
+        self.func = func
+        self.after = list(after)
+        self.gate = ReadyGate(backlog=backlog)
+
+        self.duration = None
+        self.rows = None
+        self.failed = False
+
+
+class Bootstrap:
+    def __init__(self, backlog=500):
+        self.backlog = backlog
+        self.loaders = {}
+
+    def add(self, name, func, after=()):
+        """
+        Register a loader, run with the bot when it becomes ready.
+        """
+        if name in self.loaders:
+            raise Exception("Loader {} is already registered".format(name))
+        self.loaders[name] = Loader(name, func, after, self.backlog)
+
+    def is_loaded(self, name):
+        """
+        Returns whether the given loader has finished, unregistered loaders being treated as finished.
+        """
+        return name not in self.loaders or self.loaders[name].gate.is_ready()
+
+    async def wait(self, *names):
+        """
+        Wait until the given loaders have finished.
+        """
+        for name in names:
+            if not self.is_loaded(name):
+                await self.loaders[name].gate.wait()
+
+    def defer(self, name, func, *args):
+        """
+        Queue func(*args) to be run when the given loader finishes.
+        Returns False if the loader has already finished, in which case nothing is queued.
+        """
+        if self.is_loaded(name):
+            return False
+        return self.loaders[name].gate.defer(func, *args)
+
+    def check_dependencies(self):
+        """
+        Raise if a loader depends on an unregistered loader, or the dependencies are cyclic.
+        """
+        visited = set()
+
+        def visit(name, path):
+            if name in path:
+                raise Exception("Cyclic loader dependencies: {}".format(" -> ".join(path + [name])))
+            if name in visited:
+                return
+            for dep in self.loaders[name].after:
+                if dep not in self.loaders:
+                    raise Exception("Loader {} depends on unknown loader {}".format(name, dep))
+                visit(dep, path + [name])
+            visited.add(name)
+
+        for name in self.loaders:
+            visit(name, [])
+
+    async def start(self, bot):
+        """
+        Ready event handler starting every loader.
+        Returns immediately, the loaders and the final report run in the background.
+        """
+        self.check_dependencies()
+        tasks = [asyncio.ensure_future(self._run(bot, loader)) for loader in self.loaders.values()]
+        asyncio.ensure_future(self._report(bot, tasks))
+
+    async def _run(self, bot, loader):
+        await self.wait(*loader.after)
+        start = time.monotonic()
+        try:
+            rows = await loader.func(bot)
+            loader.rows = rows if isinstance(rows, int) else None
+            loader.failed = False
+        except Exception:
+            loader.failed = True
+            await bot.log("Loader {} failed:\n{}".format(loader.name, traceback.format_exc()), error=True, level=logging.ERROR)
+        finally:
+            loader.duration = time.monotonic() - start
+            loader.gate.open()
+
+    async def _report(self, bot, tasks):
+        start = time.monotonic()
+        await asyncio.gather(*tasks)
+        lines = []
+        for loader in sorted(self.loaders.values(), key=lambda loader: -loader.duration):
+            lines.append("{:<20} {:>8.1f}ms {:>10}{}{}{}".format(loader.name,
+                                                                1000 * loader.duration,
+                                                                "{} rows".format(loader.rows) if loader.rows is not None else "-",
+                                                                ", {} deferred".format(loader.gate.deferred) if loader.gate.deferred else "",
+                                                                ", {} dropped".format(loader.gate.dropped) if loader.gate.dropped else "",
+                                                                ", failed" if loader.failed else ""))
+        await bot.log("Ran {} loaders in {:.1f}ms:\n{}".format(len(lines), 1000 * (time.monotonic() - start), "\n".join(lines)))
+
+        deferred = sum(loader.gate.deferred for loader in self.loaders.values())
+        dropped = sum(loader.gate.dropped for loader in self.loaders.values())
+        if deferred:
+            await bot.log("Replayed {} events received while loading, {} were dropped.".format(deferred - dropped, dropped))
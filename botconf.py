@@ -6,40 +6,117 @@
 import configparser as cfgp
 import json
 import os
+import time
+from types import MappingProxyType
+
+
+def freeze(value):
+    """
+    Returns a read-only copy of a parsed setting, with lists as tuples and dictionaries as mapping proxies.
+    """
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    return value
 
 
 class Conf:
     Section = 'General'
 
+    # Minimum number of seconds between checks of the configuration file for changes
+    reload_interval = 5
+
     def __init__(self, conffile):
         self.conffile = conffile
         if not os.path.isfile(conffile):
             with open(conffile, 'a+') as configfile:
                 configfile.write('')
+
+        # Incremented every time the settings are parsed, for caches built from the configuration
+        self.generation = 0
+
+        self.read()
+
+    def read(self):
+        """
+        Read and parse the configuration file into a snapshot of typed values.
+        """
         config = cfgp.ConfigParser()
-        config.read(conffile)
+        config.read(self.conffile)
         if self.Section not in config.sections():
             config[self.Section] = {}
         self.settings = config[self.Section]
         self.config = config
+        self.mtime = self._mtime()
+        self.checked = time.monotonic()
+        self.parse()
+
+    def parse(self):
+        """
+        Parse the settings into a new snapshot.
+        Settings which are not valid JSON are left out, and raise when they are read.
+        The snapshot is shared by every caller, so list and dictionary settings are frozen.
+        """
+        values = {}
+        for settingName, setting in self.settings.items():
+            try:
+                values[settingName] = freeze(json.loads(setting))
+            except ValueError:
+                pass
+        self.values = values
+        self.intsets = {}
+        self.generation += 1
+
+    def _mtime(self):
+        try:
+            return os.stat(self.conffile).st_mtime
+        except OSError:
+            return None
+
+    def refresh(self):
+        """
+        Re-read the configuration file if it has changed on disk.
+        The file is checked at most once every reload_interval seconds.
+        """
+        now = time.monotonic()
+        if now - self.checked < self.reload_interval:
+            return
+        self.checked = now
+        if self._mtime() != self.mtime:
+            self.read()
 
     def get(self, settingName, default=None):
+        self.refresh()
+        settingName = settingName.lower()
+        if settingName in self.values:
+            return self.values[settingName]
         if settingName not in self.settings:
             return default
-        setting = self.settings[settingName]
-
-        return json.loads(setting)
+        return json.loads(self.settings[settingName])
 
     def getintlist(self, settingName, default=[]):
         return self.get(settingName, default)
 
+    def getintset(self, settingName):
+        """
+        Returns the given list of ids as a frozenset of integers, for fast membership checks.
+        """
+        self.refresh()
+        settingName = settingName.lower()
+        if settingName not in self.intsets:
+            self.intsets[settingName] = frozenset(int(item) for item in (self.get(settingName) or []))
+        return self.intsets[settingName]
+
     def getStr(self, settingName, default=""):
         return self.get(settingName, default)
 
     def set(self, settingName, value):
         self.settings[settingName] = str(value)
         self.write()
+        self.parse()
 
     def write(self):
         with open(self.conffile, 'w') as configfile:
             self.config.write(configfile)
+        self.mtime = self._mtime()
@@ -1,58 +1,87 @@
 import discord
 
+from timings import timed
+
 checks = {}
 
 
 def check(name):
     def decorator(func):
-        checks[name.lower()] = func
+        checks[name.lower()] = timed("check", name.lower())(func)
         return func
     return decorator
 
 
+# Bot permission tiers, as (tier, configuration list, tiers included in this tier)
+# A user has a tier if they are in its configuration list, or have any tier it includes
+tiers = [("master", "masters", []),
+         ("exec", "execWhiteList", ["master"]),
+         ("dev", "developers", ["exec"]),
+         ("manager", "managers", ["exec"]),
+         ("contrib", "contributors", ["manager"])]
+
+# The permission levels built from the current configuration, see permission_levels
+_levels = {"conf": None, "generation": None, "levels": {}}
+
+
+def permission_levels(conf):
+    """
+    Returns a dictionary mapping the id of each user with a bot permission tier to the frozenset of their tiers.
+    The map is rebuilt whenever the configuration changes.
+    """
+    conf.refresh()
+    if _levels["conf"] is not conf or _levels["generation"] != conf.generation:
+        granted = {}
+        for tier, setting, included in tiers:
+            granted[tier] = set(conf.getintset(setting)).union(*(granted[inc] for inc in included))
+        levels = {}
+        for tier, users in granted.items():
+            for userid in users:
+                levels.setdefault(userid, set()).add(tier)
+        _levels["levels"] = {userid: frozenset(user_tiers) for userid, user_tiers in levels.items()}
+        _levels["generation"] = conf.generation
+        _levels["conf"] = conf
+    return _levels["levels"]
+
+
+def has_tier(ctx, userid, tier):
+    """
+    Returns whether the given user has the given bot permission tier.
+    """
+    return tier in permission_levels(ctx.bot.bot_conf).get(int(userid), ())
+
+
 @check("master_perm")
 async def check_master_perm(ctx):
-    if int(ctx.authid) not in ctx.bot.bot_conf.getintlist("masters"):
+    if not has_tier(ctx, ctx.authid, "master"):
         return (1, "This requires you to be one of my masters!")
     return (0, "")
 
 
 @check("exec_perm")
 async def check_exec_perm(ctx):
-    (code, msg) = await checks["master_perm"](ctx)
-    if code == 0:
-        return (code, msg)
-    if int(ctx.authid) not in ctx.bot.bot_conf.getintlist("execWhiteList"):
+    if not has_tier(ctx, ctx.authid, "exec"):
         return (1, "You don't have the required Exec perms to do this!")
     return (0, "")
 
 
 @check("dev_perm")
 async def check_dev_perm(ctx):
-    (code, msg) = await checks["exec_perm"](ctx)
-    if code == 0:
-        return (code, msg)
-    if int(ctx.authid) not in ctx.bot.bot_conf.getintlist("developers"):
+    if not has_tier(ctx, ctx.authid, "dev"):
         return (1, "You need to be one of my developers to do this!")
     return (0, "")
 
 
 @check("contrib_perm")
 async def check_contrib_perm(ctx):
-    (code, msg) = await checks["manager_perm"](ctx)
-    if code == 0:
-        return (code, msg)
-    if int(ctx.authid) not in ctx.bot.bot_conf.getintlist("contributors"):
+    if not has_tier(ctx, ctx.authid, "contrib"):
         return (1, "You need to be a bot contributor to do this!")
     return (0, "")
 
 
 @check("manager_perm")
 async def check_manager_perm(ctx):
-    (code, msg) = await checks["exec_perm"](ctx)
-    if code == 0:
-        return (code, msg)
-    if int(ctx.authid) not in ctx.bot.bot_conf.getintlist("managers"):
+    if not has_tier(ctx, ctx.authid, "manager"):
         return (1, "You lack the required bot manager perms to do this!")
     return (0, "")
 
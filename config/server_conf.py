@@ -35,11 +35,24 @@ class Server_Setting_Prefix(Server_Setting, settingTypes.STR):
     vis_name = "prefix"
     desc = "Custom server prefix"
     category = "Guild settings"
+    loader = "prefixes"
 
     @classmethod
     async def dyn_default(cls, ctx):
         return ctx.bot.prefix
 
+    @classmethod
+    async def write(cls, ctx, value):
+        result = await super().write(ctx, value)
+        if ctx.cmd_err[0]:
+            return result
+        if "server_prefixes" in ctx.bot.objects:
+            if value:
+                ctx.bot.objects["server_prefixes"][ctx.server.id] = value
+            else:
+                ctx.bot.objects["server_prefixes"].pop(ctx.server.id, None)
+        return result
+
 
 @server_conf.setting
 class Server_Setting_Starboard(Server_Setting, settingTypes.BOOL):
@@ -48,6 +61,7 @@ class Server_Setting_Starboard(Server_Setting, settingTypes.BOOL):
     desc = "Enable/Disable Starboard"
     category = "Starboard"
     default = False
+    loader = "starboards"
 
     outputs = {True: "Enabled",
                False: "Disabled"}
@@ -89,6 +103,7 @@ class Server_Setting_StarEmoji(Server_Setting, settingTypes.EMOJI):
     desc = "Starboard emoji"
     category = "Starboard"
     default = "⭐"
+    loader = "starboards"
 
     @classmethod
     async def write(cls, ctx, value):
@@ -148,6 +163,7 @@ class Server_Setting_Clean_Channels(Server_Setting, settingTypes.CHANNELLIST):
     desc = "Automatically delete new messages in these channels."
     category = "Guild settings"
     default = None
+    loader = "cleaned_channels"
 
     @classmethod
     async def write(cls, ctx, value):
@@ -198,6 +214,7 @@ class Server_Setting_Channel_Blacklist(Server_Setting, settingTypes.CHANNELLIST)
     desc = "Disable non-moderator command responses in these channels."
     category = "Guild settings"
     default = None
+    loader = "channel_blacklists"
 
     @classmethod
     async def write(cls, ctx, value):
@@ -305,6 +322,7 @@ class Server_Setting_Latex_Listen(Server_Setting, settingTypes.BOOL):
     desc = "Enables/Disables listening for LaTeX messages"
     default = False
     category = "Mathematical settings"
+    loader = "tex_listeners"
 
     outputs = {True: "Enabled",
                False: "Disabled"}
@@ -329,6 +347,7 @@ class Server_Setting_Maths_Channels(Server_Setting, settingTypes.CHANNELLIST):
     desc = "Only listen to LaTeX in these channels, if set"
     category = "Mathematical settings"
     default = None
+    loader = "tex_listeners"
 
     @classmethod
     async def humanise(cls, ctx, raw):
@@ -0,0 +1,74 @@
+import sys
+from cachetools import TTLCache
+
+"""
+Cache of recently executed commands, used to rerun a command when its message is edited.
+
+Only the parts of the command context needed to handle the edit are kept, see EditRecord.
+Records are evicted least recently used once the cache is full, and after ttl seconds.
+"""
+
+
+class EditRecord:
+    """
+    Edit tracking record of an executed command.
+    cmd is the command which was executed, prefix the prefix it was invoked with,
+    and sent_messages the list of messages sent in reply, shared with the command context.
+    """
+    __slots__ = ("cmd", "prefix", "sent_messages")
+
+    def __init__(self, cmd, prefix, sent_messages):
+        self.cmd = cmd
+        self.prefix = prefix
+        self.sent_messages = sent_messages
+
+
+class EditCache:
+    def __init__(self, size=1000, ttl=600):
+        self.size = size
+        self.ttl = ttl
+        self.cache = TTLCache(size, ttl)
+
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, ctx):
+        """
+        Track the command executed in the given context.
+        Commands without an edit handler are not tracked.
+        """
+        if ctx.cmd.edit_handler is not None:
+            self.cache[ctx.msg.id] = EditRecord(ctx.cmd, ctx.used_prefix, ctx.sent_messages)
+
+    def get(self, msgid):
+        """
+        Returns the record of the command executed from the given message, or None if it is not tracked.
+        """
+        record = self.cache.get(msgid, None)
+        if record is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return record
+
+    def __contains__(self, msgid):
+        return msgid in self.cache
+
+    def memory(self):
+        """
+        Approximate memory used by the cache in bytes, excluding the shared commands and messages.
+        """
+        total = sys.getsizeof(self.cache)
+        for msgid, record in list(self.cache.items()):
+            total += sys.getsizeof(msgid) + sys.getsizeof(record) + sys.getsizeof(record.sent_messages)
+        return total
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"size": len(self.cache),
+                "maxsize": self.size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0,
+                "memory": self.memory()}
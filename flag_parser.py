@@ -0,0 +1,136 @@
+import re
+
+"""
+Command flag parsing.
+
+A FlagParser is compiled once from a flag specification, and parses argument strings in a single pass.
+Flag formats:
+    'a': boolean flag, checks if present.
+    'a=': Eats one "word"
+    'a==': Eats all words up until next flag
+Flags may be given as -a, --a or —a in the arguments.
+If -- is present in the input as a word, all flags afterwards are ignored.
+"""
+
+# Split across whitespace, keeping the whitespace
+splitter = re.compile(r'(\S+)')
+
+# Flag prefixes, in order of precedence
+prefixes = ["-", "--", "—"]
+
+BOOL = 0
+WORD = 1
+LONG = 2
+
+
+class FlagParser:
+    def __init__(self, flags):
+        self.flags = list(flags)
+
+        # Flag names, types and the order they were declared in
+        self.names = []
+        self.kinds = []
+
+        # Lookup table of {token: [(flag number, prefix precedence)]}
+        self.lookup = {}
+
+        for i, flag in enumerate(self.flags):
+            self.names.append(flag.strip("="))
+            self.kinds.append(LONG if flag.endswith("==") else (WORD if flag.endswith("=") else BOOL))
+            for precedence, prefix in enumerate(prefixes):
+                self.lookup.setdefault(prefix + self.names[i], []).append((i, precedence))
+
+    def parse(self, args):
+        """
+        Parses the flags in args.
+        Returns a tuple (params, args, flags_present).
+        flags_present is a dictionary {flag: value} with value being:
+            False if a flag isn't present,
+            True if a boolean flag is present,
+            the value of the flag for a long flag.
+        """
+        if "-" not in args and "—" not in args:
+            # No flags or terminator can be present
+            final_args = args.strip()
+            return (final_args.split(' '), final_args, {name: False for name in self.names})
+
+        params = splitter.split(args)
+        end_params = []  # The tail of the parameter list, after -- appears
+
+        # Find the first position of each flag, for each prefix
+        found = {}
+        lookup = self.lookup
+        for index in range(1, len(params), 2):
+            token = params[index]
+            if token == "--":
+                end_params = params[index + 1:]
+                params = params[:index]
+                break
+            if token in lookup:
+                for key in lookup[token]:
+                    if key not in found:
+                        found[key] = index
+
+        final_flags = {}  # Dictionary of flags and flag values
+        indexes = []  # Indices in the params list where the flags appear, with the flag number
+
+        for i, name in enumerate(self.names):
+            for precedence in range(len(prefixes)):
+                if (i, precedence) in found:
+                    indexes.append((found[(i, precedence)], i))
+                    break
+            else:
+                final_flags[name] = False
+
+        # Step through the flags in order of appearance
+        indexes.sort()
+
+        # Add any parameters that appear before the first flag
+        final_params = params[0:indexes[0][0]] if indexes else params
+
+        # Build the parameters and flag arguments
+        for (n, (index, i)) in enumerate(indexes):
+            # Get the parameters between this flag and the next, or the end
+            flag_params = params[index + 1:indexes[n + 1][0]] if n + 1 < len(indexes) else params[index + 1:]
+
+            # Split these into flag arguments and final parameters depending on flag type
+            kind = self.kinds[i]
+            if kind == LONG:
+                flag_arg = ''.join(flag_params).strip()
+            elif kind == WORD:
+                # Find the first non-whitespace param, if it exists
+                j, arg = next(((j, arg) for j, arg in enumerate(flag_params) if arg.strip()), (len(flag_params), None))
+
+                flag_arg = arg or ''
+
+                # If there are any more params, add them to the final bunch
+                if len(flag_params) > j + 1:
+                    final_params.append(''.join(flag_params[j+1:]).rstrip())
+            else:
+                flag_arg = True
+                final_params.append(''.join(flag_params).rstrip())
+
+            # Set the flag arguments
+            final_flags[self.names[i]] = flag_arg
+
+        # Add any tail parameters
+        final_params += end_params
+
+        # Turn the parameter list into what we usually use, i.e. space split, and make the args
+        final_args = ''.join(final_params).strip()
+        final_params = final_args.split(' ')
+        return (final_params, final_args, final_flags)
+
+
+# Parsers compiled for flag specifications given at parse time, such as by the flags snippet
+_parsers = {}
+
+
+def get_parser(flags):
+    """
+    Returns the compiled parser for the given flag specification.
+    """
+    key = tuple(flags)
+    if key not in _parsers:
+        _parsers[key] = FlagParser(key)
+    return _parsers[key]
@@ -1,9 +1,12 @@
+from contextBot.Context import MessageContext as MCtx
+
+
 async def handle_command_edit(bot, before, after):
     if before.content != after.content:
-        if before.id in bot.objects["command_cache"]:
-            ctx = bot.objects["command_cache"][before.id]
-            if ctx.cmd.edit_handler is not None:
-                await ctx.cmd.edit_handler(ctx, after)
+        record = bot.objects["command_cache"].get(before.id)
+        if record is not None:
+            ctx = MCtx(bot=bot, message=after)
+            await record.cmd.edit_handler(ctx, record)
 
 
 def load_into(bot):
@@ -0,0 +1,51 @@
+"""
+Invalidation of the cached channel permissions when channels, roles, members or servers change.
+"""
+
+
+async def channel_updated(bot, before, after):
+    if not after.is_private:
+        bot.objects["permission_cache"].invalidate_channel(after.server.id, after.id)
+
+
+async def channel_deleted(bot, channel):
+    if not channel.is_private:
+        bot.objects["permission_cache"].invalidate_channel(channel.server.id, channel.id)
+
+
+async def member_updated(bot, before, after):
+    if before.roles != after.roles:
+        bot.objects["permission_cache"].invalidate_member(after.server.id, after.id)
+
+
+async def member_removed(bot, member):
+    bot.objects["permission_cache"].invalidate_member(member.server.id, member.id)
+
+
+async def role_updated(bot, before, after):
+    bot.objects["permission_cache"].invalidate_server(after.server.id)
+
+
+async def role_deleted(bot, role):
+    bot.objects["permission_cache"].invalidate_server(role.server.id)
+
+
+async def server_updated(bot, before, after):
+    # The server owner has every permission
+    if before.owner_id != after.owner_id:
+        bot.objects["permission_cache"].invalidate_server(after.id)
+
+
+async def server_removed(bot, server):
+    bot.objects["permission_cache"].invalidate_server(server.id)
+
+
+def load_into(bot):
+    bot.add_after_event("channel_update", channel_updated)
+    bot.add_after_event("channel_delete", channel_deleted)
+    bot.add_after_event("member_update", member_updated)
+    bot.add_after_event("member_remove", member_removed)
+    bot.add_after_event("server_role_update", role_updated)
+    bot.add_after_event("server_role_delete", role_deleted)
+    bot.add_after_event("server_update", server_updated)
+    bot.add_after_event("server_remove", server_removed)
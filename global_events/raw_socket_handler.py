@@ -1,25 +1,177 @@
 import os
+import re
+import stat
+import time
+import struct
+import asyncio
+import threading
+from collections import deque
+
+"""
+Raw gateway tap, writing the raw gateway payloads to a named pipe for external consumers.
+
+Payloads are queued in a bounded ring buffer by the event handler, and written to the pipe by a background thread,
+so a stalled reader never blocks event dispatch.
+Configuration (paradox.conf):
+    raw_tap_size: Number of payloads the buffer holds (default 10000)
+    raw_tap_policy: What to do with payloads received while the buffer is full
+        drop_oldest: Drop the oldest buffered payload (default)
+        drop_newest: Drop the received payload
+        wait: Wait up to raw_tap_timeout seconds (default 1) for space, then drop the received payload
+    raw_tap_framing: How payloads are framed on the pipe
+        length: Each payload is preceded by its length in bytes, as a 4 byte big endian integer (default)
+        line: Each payload is followed by a newline
+    raw_tap_events: Optional list of gateway event types (such as "MESSAGE_CREATE") to write, all others are skipped
+"""
 
 app = os.getcwd().split(os.sep)[-1]
 pipefile = "/home/paradox/pipe/"+app
 
 existence = os.path.exists(pipefile)
 
-cest_une_pipe = None
+# Gateway event type of a raw payload
+event_type = re.compile(r'"t"\s*:\s*(?:null|"(\w*)")')
 
 
-async def handle_raw_socket(bot, msg):
-    if not existence:
-        return
+class RawTap:
+    def __init__(self, path, size=10000, policy="drop_oldest", timeout=1, framing="length", events=None):
+        if policy not in ("drop_oldest", "drop_newest", "wait"):
+            raise Exception("Unknown raw tap policy {}".format(policy))
+        if framing not in ("length", "line"):
+            raise Exception("Unknown raw tap framing {}".format(framing))
+        self.path = path
+        self.size = size
+        self.policy = policy
+        self.timeout = timeout
+        self.framing = framing
+        self.events = set(events) if events else None
+
+        self.buffer = deque(maxlen=size)
+        self.cond = threading.Condition()
+        self.space = asyncio.Event()
+        self.loop = asyncio.get_event_loop()
+        self.thread = None
+
+        self.started = time.monotonic()
+        self.received = 0
+        self.filtered = 0
+        self.written = 0
+        self.bytes = 0
+        self.dropped = 0  # Payloads dropped from the buffer, updated by the event loop
+        self.write_failures = 0  # Payloads which could not be written, updated by the writer thread
+
+    def start(self):
+        self.thread = threading.Thread(target=self._writer, name="raw-tap", daemon=True)
+        self.thread.start()
+
+    def wanted(self, payload):
+        """
+        Returns whether the payload passes the event type filter.
+        """
+        if self.events is None:
+            return True
+        match = event_type.search(payload)
+        return bool(match) and match.group(1) in self.events
+
+    async def put(self, payload):
+        """
+        Queue a payload for writing, applying the configured policy if the buffer is full.
+        """
+        self.received += 1
+        if not self.wanted(payload):
+            self.filtered += 1
+            return
+        if len(self.buffer) >= self.size:
+            if self.policy == "drop_newest":
+                self.dropped += 1
+                return
+            if self.policy == "wait":
+                self.space.clear()
+                try:
+                    await asyncio.wait_for(self.space.wait(), self.timeout)
+                except asyncio.TimeoutError:
+                    self.dropped += 1
+                    return
+        with self.cond:
+            if len(self.buffer) >= self.size:
+                # The oldest payload is pushed out of the ring buffer
+                self.dropped += 1
+            self.buffer.append(payload)
+            self.cond.notify()
 
-    global cest_une_pipe
-    if cest_une_pipe is None:
-        cest_une_pipe = open(pipefile, "w")
+    def is_fifo(self):
+        try:
+            return stat.S_ISFIFO(os.stat(self.path).st_mode)
+        except OSError:
+            return False
+
+    def frame(self, payload):
+        data = payload.encode("utf-8")
+        if self.framing == "length":
+            return struct.pack(">I", len(data)) + data
+        return data + b"\n"
+
+    def _writer(self):
+        pipe = None
+        while True:
+            with self.cond:
+                while not self.buffer:
+                    self.cond.wait()
+                payloads = list(self.buffer)
+                self.buffer.clear()
+            self.loop.call_soon_threadsafe(self.space.set)
+
+            data = b"".join(self.frame(payload) for payload in payloads)
+            if pipe is None and not self.is_fifo():
+                # The pipe was removed, drop the payloads instead of writing them to a regular file in its place
+                self.write_failures += len(payloads)
+                time.sleep(1)
+                continue
+            try:
+                if pipe is None:
+                    # Blocks until a reader opens the pipe
+                    pipe = open(self.path, "wb")
+                pipe.write(data)
+                pipe.flush()
+            except OSError:
+                # The reader went away, drop the payloads and reopen the pipe
+                self.write_failures += len(payloads)
+                if pipe is not None:
+                    try:
+                        pipe.close()
+                    except OSError:
+                        pass
+                pipe = None
+                continue
+            self.written += len(payloads)
+            self.bytes += len(data)
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started
+        return {"received": self.received,
+                "filtered": self.filtered,
+                "written": self.written,
+                "bytes": self.bytes,
+                "dropped": self.dropped,
+                "write_failures": self.write_failures,
+                "buffered": len(self.buffer),
+                "rate": self.written / elapsed if elapsed else 0}
+
+
+async def handle_raw_socket(bot, msg):
     if isinstance(msg, str):
-        cest_une_pipe.write(msg)
-        cest_une_pipe.write('\n')
+        await bot.objects["raw_tap"].put(msg)
 
 
 def load_into(bot):
     if existence:
+        conf = bot.bot_conf
+        tap = RawTap(pipefile,
+                     size=conf.get("raw_tap_size", 10000),
+                     policy=conf.get("raw_tap_policy", "drop_oldest"),
+                     timeout=conf.get("raw_tap_timeout", 1),
+                     framing=conf.get("raw_tap_framing", "length"),
+                     events=conf.get("raw_tap_events", None))
+        tap.start()
+        bot.objects["raw_tap"] = tap
         bot.add_after_event("socket_raw_receive", handle_raw_socket, priority=5)
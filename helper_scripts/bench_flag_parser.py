@@ -0,0 +1,115 @@
+import random
+import re
+import timeit
+
+from flag_parser import FlagParser
+
+# Microbenchmark of the compiled flag parser against the original parse_flags implementation
+# Run from the bot directory, checks that both parsers agree before timing them
+
+
+def legacy_parse_flags(args, flags=[]):
+    # Split across whitespace, keeping the whitespace
+    params = re.split(r'(\S+)', args)
+
+    final_params = []  # Final list of command parameters, excluding flags and flag arguments
+    final_flags = {}  # Dictionary of flags and flag values
+    indexes = []  # Indices in the params list where the flags appear
+    end_params = []  # The tail of the parameter list, after -- appears
+
+    # Handle appearence of the flag terminator
+    if "--" in params:
+        i = params.index('--')
+        end_params = params[i + 1:] if i < len(params) - 1 else []
+        params = params[:i]
+
+    # Find the param indicies of the flags
+    for flag in flags:
+        clean_flag = flag.strip("=")
+
+        if ("-" + clean_flag) in params:
+            index = params.index("-" + clean_flag)
+        elif ("--" + clean_flag) in params:
+            index = params.index("--" + clean_flag)
+        elif ("—" + clean_flag) in params:
+            index = params.index("—" + clean_flag)
+        else:
+            final_flags[clean_flag] = False
+            continue
+        indexes.append((index, flag))
+
+    # Sort the indicies to ensure we step through the flags in order of appearance
+    indexes = sorted(indexes)
+
+    # Add any parameters that appear before the first flag
+    if len(indexes) > 0:
+        final_params = params[0:indexes[0][0]]
+    else:
+        final_params = params
+
+    # Build the parameters and flag arguments
+    for (i, (index, flag)) in enumerate(indexes):
+        # Get the parameters between this flag and the next, or the end
+        if len(params) > index + 1:
+            if len(indexes) > i + 1:
+                flag_params = params[index + 1:indexes[i + 1][0]]
+            else:
+                flag_params = params[index + 1:]
+        else:
+            flag_params = []
+
+        # Split these into flag arguments and final parameters depending on flag type
+        if flag.endswith('=='):
+            flag_arg = ''.join(flag_params).strip()
+        elif flag.endswith('='):
+            # Find the first non-whitespace param, if it exists
+            j, arg = next(((j, arg) for j, arg in enumerate(flag_params) if arg.strip()), (len(flag_params), None))
+
+            flag_arg = arg or ''
+
+            # If there are any more params, add them to the final bunch
+            if len(flag_params) > j + 1:
+                final_params.append(''.join(flag_params[j+1:]).rstrip())
+        else:
+            flag_arg = True
+            final_params.append(''.join(flag_params).rstrip())
+
+        # Set the flag arguments
+        final_flags[flag.strip('=')] = flag_arg
+
+    # Add any tail parameters
+    final_params += end_params
+
+    # Turn the parameter list into what we usually use, i.e. space split, and make the args
+    final_args = ''.join(final_params).strip()
+    final_params = final_args.split(' ')
+    return (final_params, final_args, final_flags)
+
+
+flags = ["config", "keepmsg", "color==", "colour==", "alwaysmath", "allowother", "name"]
+parser = FlagParser(flags)
+
+words = ["\\frac{a}{b}", "x^2", "+", "-", "\\int_0^1", "f(x)", "dx", "=", "\\sum_{n=1}^\\infty", "\\alpha", "\n", "\\\\"]
+flag_words = ["-config", "--keepmsg", "-color", "red", "-name", "—alwaysmath", "--"]
+
+random.seed(0)
+samples = {
+    "short": "-config -color blue",
+    "tex_1k": " ".join(random.choice(words) for _ in range(200)),
+    "tex_10k": " ".join(random.choice(words) for _ in range(2000)),
+    "tex_10k_no_minus": " ".join(random.choice(words[:3] + words[4:]) for _ in range(2000)),
+    "tex_10k_flags": " ".join(random.choice(words + flag_words) for _ in range(2000)),
+}
+
+# Check the parsers agree on random inputs
+for _ in range(2000):
+    args = " ".join(random.choice(words + flag_words + ["-a", "a"]) for _ in range(random.randint(0, 20)))
+    if parser.parse(args) != legacy_parse_flags(args, flags):
+        raise Exception("Parsers disagree on {!r}".format(args))
+
+for name, args in samples.items():
+    number = 20000 if name == "short" else 200
+    old = timeit.timeit(lambda: legacy_parse_flags(args, flags), number=number)
+    new = timeit.timeit(lambda: parser.parse(args), number=number)
+    print("{:<17} {:>7} chars: legacy {:8.2f}us, compiled {:8.2f}us, {:.1f}x faster".format(
+        name, len(args), old / number * 1e6, new / number * 1e6, old / new))
@@ -0,0 +1,71 @@
+from botconf import Conf
+
+conf = Conf("paradox.conf")
+
+# This script rewrites every JSON value in the long tables with the compression settings in db_compression
+# Values at least as long as the threshold are compressed, and shorter values are stored as plain JSON
+# With db_compression unset, every compressed value is decompressed again
+# Stop the bot before running it
+
+compression = conf.get("db_compression")
+
+DB_TYPE = conf.get("DB_TyPE")
+if not DB_TYPE or DB_TYPE.lower() == "sqlite":
+    from paradata_sqlite import BotData
+    dbopts = {'data_file': conf.get("bot_data_file")}
+    placeholder = "?"
+else:
+    from paradata_mysql import BotData
+    dbopts = {
+        'username': conf.get('username'),
+        'password': conf.get('password'),
+        'host': conf.get('host'),
+        'database': conf.get('database')
+    }
+    placeholder = "%s"
+
+print("Establishing data object")
+data = BotData(app="", compression=compression, **dbopts)
+
+
+def rewrite_table(conn, table):
+    codec = table.json_codec
+    key_list = ", ".join(table.keys)
+    criteria = " AND ".join("{} = {}".format(key, placeholder) for key in [*table.keys, "property"])
+
+    cursor = conn.cursor()
+    cursor.execute('SELECT {}, property, value FROM {} WHERE value IS NOT NULL'.format(key_list, table.table))
+    rows = cursor.fetchall()
+
+    updates = []
+    before = 0
+    after = 0
+    for row in rows:
+        stored = row[-1]
+        if not stored:
+            continue
+        new = codec.encode(codec.decode(stored))
+        before += len(stored)
+        after += len(new)
+        if new != stored:
+            updates.append((new, *row[:-1]))
+
+    cursor.executemany('UPDATE {} SET value = {} WHERE {}'.format(table.table, placeholder, criteria), updates)
+    conn.commit()
+    print("Rewrote {} of {} values in {}, {} bytes to {} bytes".format(len(updates), len(rows), table.table, before, after))
+
+
+for table in data.tables:
+    if table.table.endswith("_long"):
+        if placeholder == "?":
+            data.executor.call(rewrite_table, data.conn, table)
+        else:
+            # The MySQL backend has no shared connection, run with a connection from the pool
+            data.call(rewrite_table, table)
+
+if placeholder == "?":
+    print("Vacuuming database")
+    data.executor.call(data.conn.execute, "VACUUM")
+
+data.close()
+print("Done")
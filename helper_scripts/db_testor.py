@@ -1,4 +1,5 @@
 import asyncio
+import time
 
 from paradata_mysql import BotData
 from botconf import Conf
@@ -17,8 +18,8 @@ fakedata2 = [i for i in range(10)]
 """
 dbfile = "testdata.db"
 
-data_noapp = BotData(dbfile, app="")
-data_testapp = BotData(dbfile, app="testapp")
+data_noapp = BotData(app="", data_file=dbfile)
+data_testapp = BotData(app="testapp", data_file=dbfile)
 """
 
 # Initialisation data for the mysql version
@@ -27,7 +28,8 @@ dbopts = {
     'username': conf.get('username'),
     'password': conf.get('password'),
     'host': conf.get('host'),
-    'database': conf.get('database')
+    'database': conf.get('database'),
+    'pool_size': conf.get('db_pool_size', 5)
 }
 
 data_noapp = BotData(app="", **dbopts)
@@ -110,6 +112,29 @@ async def main():
     if response != [fakeuser]:
         print("ISSUE: Got the following response from find not empty:\n{}\nExpecting:\n{}".format(response, [fakeuser]))
 
+    # Test concurrent access, as when many commands hit the database at once
+    print("Testing concurrent reads and writes")
+    start = time.monotonic()
+    await asyncio.gather(*(data_noapp.users.set(fakeuser + i, "property2", [i]) for i in range(200)))
+    responses = await asyncio.gather(*(data_noapp.users.get(fakeuser + i, "property2") for i in range(200)))
+    if responses != [[i] for i in range(200)]:
+        print("ISSUE: Concurrent reads did not return the concurrently written values")
+    print("400 concurrent calls took {:.2f}s".format(time.monotonic() - start))
+
+    # Test batches, which hold their own connection for the whole unit of work
+    print("Testing concurrent batches")
+
+    async def batch_write(i):
+        async with data_noapp.batch():
+            await data_noapp.users.set(fakeuser + i, "property1", fakedata1)
+            await data_noapp.members.set(fakeserver, fakeuser + i, "property1", fakedata1)
+
+    await asyncio.gather(*(batch_write(i) for i in range(20)))
+    response = await data_noapp.members.get(fakeserver, fakeuser + 19, "property1")
+    if response != fakedata1:
+        print("ISSUE: Got\n{}\nfor batched member write. Expected\n{}".format(response, fakedata1))
+    print("Executor and pool statistics: {}".format(data_noapp.executor_stats()))
+
     print("All tests complete")
 
 if __name__ == "__main__":
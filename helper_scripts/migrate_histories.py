@@ -0,0 +1,57 @@
+import asyncio
+
+from botconf import Conf
+
+conf = Conf("paradox.conf")
+
+# This script copies the name, nickname and piggybank histories stored as lists in the long tables
+# into the append-only history tables
+# The old values are left in place, run it once with the bot stopped
+
+DB_TYPE = conf.get("DB_TyPE")
+if not DB_TYPE or DB_TYPE.lower() == "sqlite":
+    from paradata_sqlite import BotData
+    dbopts = {'data_file': conf.get("bot_data_file")}
+else:
+    from paradata_mysql import BotData
+    dbopts = {
+        'username': conf.get('username'),
+        'password': conf.get('password'),
+        'host': conf.get('host'),
+        'database': conf.get('database')
+    }
+
+print("Establishing data object")
+data = BotData(app=conf.get("APP"), **dbopts)
+
+# Declare the properties as the modules do, so that app specific properties are mapped correctly
+data.users_long.ensure_exists("name_history")
+data.members_long.ensure_exists("nickname_history")
+data.users_long.ensure_exists("piggybank_history", shared=False)
+data.users_history.ensure_exists("piggybank_history", shared=False)
+
+
+async def main():
+    names = await data.users_long.find_all("name_history")
+    print("Copying {} name histories".format(len(names)))
+    async with data.batch():
+        for userid, history in names.items():
+            await data.users_history.append_many(userid, "name_history", history)
+
+    nicknames = await data.members_long.find_all("nickname_history")
+    print("Copying {} nickname histories".format(len(nicknames)))
+    async with data.batch():
+        for (serverid, userid), history in nicknames.items():
+            await data.members_history.append_many(serverid, userid, "nickname_history", [name for name in history if name is not None])
+
+    piggybanks = await data.users_long.find_all("piggybank_history")
+    print("Copying {} piggybank histories".format(len(piggybanks)))
+    async with data.batch():
+        for userid, transactions in piggybanks.items():
+            for timestamp in sorted(transactions, key=int):
+                await data.users_history.append(userid, "piggybank_history", transactions[timestamp], timestamp=int(timestamp))
+
+
+asyncio.get_event_loop().run_until_complete(main())
+data.close()
+print("Done")
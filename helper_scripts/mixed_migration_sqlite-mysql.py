@@ -38,7 +38,8 @@ dbopts = {
     'database': conf.get('database')
 }
 new_data = new_botdata(app="", **dbopts)
-new_conn = new_data.conn
+# Borrow a connection from the pool for the whole migration
+new_conn = new_data.checkout()
 
 # Explicitly list the keys we want to move to the long tables in the process
 print("Creating lists of keys to move to the long tables")
@@ -105,3 +106,6 @@ if __name__ == "__main__":
     migrate("users", 1, long_user_props)
     migrate("members", 2, long_member_props)
     migrate("servers", 1, long_server_props)
+
+    new_data.release(new_conn)
+    new_data.close()
@@ -0,0 +1,145 @@
+import asyncio
+import queue
+import logging
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener
+
+import discord
+
+"""
+Queue based logging pipeline.
+
+Log records are put on a bounded queue by the event loop, and written to the log handlers by a background thread.
+Log messages for the Discord log channels are coalesced by a LogSender into as few messages as possible.
+When either is overloaded the newest (queue) or oldest (sender) messages are dropped and counted.
+"""
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Queue handler counting and dropping records when the queue is full, instead of blocking the event loop.
+    """
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stats(self):
+        return {"queued": self.queue.qsize(),
+                "maxsize": self.queue.maxsize,
+                "dropped": self.dropped}
+
+
+def setup_logging(logger, handlers, size=10000):
+    """
+    Route the records of the given logger through a bounded queue to the given handlers.
+    Returns the queue handler and the started listener, which should be stopped on shutdown.
+    """
+    log_queue = queue.Queue(size)
+    queue_handler = DroppingQueueHandler(log_queue)
+    logger.addHandler(queue_handler)
+    listener = QueueListener(log_queue, *handlers)
+    listener.start()
+    return (queue_handler, listener)
+
+
+class LogSender:
+    """
+    Coalescing sender of log messages to Discord channels.
+
+    Messages pushed within interval seconds of each other are packed into as few code blocks
+    of at most limit characters as possible.
+    At most backlog messages are kept waiting, the oldest are dropped past that.
+    """
+    def __init__(self, bot, interval=2, backlog=200, limit=2000):
+        self.bot = bot
+        self.interval = interval
+        self.limit = limit
+
+        self.pending = deque(maxlen=backlog)  # Waiting messages, as (channelid, message)
+        self.wakeup = None
+        self.task = None
+
+        self.dropped = 0
+        self.unreported = 0  # Drops not yet reported in the log channels
+        self.sent = 0
+        self.batches = 0
+
+    def push(self, channelid, message):
+        """
+        Queue a message to be sent to the given channel.
+        """
+        if len(self.pending) == self.pending.maxlen:
+            self.dropped += 1
+            self.unreported += 1
+        self.pending.append((channelid, message))
+        if self.task is None:
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.ensure_future(self._run())
+        self.wakeup.set()
+
+    def pack(self, messages):
+        """
+        Pack the given messages into code blocks of at most limit characters.
+        """
+        room = self.limit - len("```\n\n```")
+        lines = []
+        for message in messages:
+            for line in message.replace("```", "`​``").split("\n"):
+                while len(line) > room:
+                    lines.append(line[:room])
+                    line = line[room:]
+                lines.append(line)
+
+        chunks = []
+        chunk = []
+        size = 0
+        for line in lines:
+            if chunk and size + len(line) + 1 > room:
+                chunks.append(chunk)
+                chunk = []
+                size = 0
+            chunk.append(line)
+            size += len(line) + 1
+        if chunk:
+            chunks.append(chunk)
+        return ["```\n{}\n```".format("\n".join(chunk)) for chunk in chunks]
+
+    async def _run(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            await asyncio.sleep(self.interval)
+
+            batches = {}
+            while self.pending:
+                channelid, message = self.pending.popleft()
+                batches.setdefault(channelid, []).append(message)
+            if self.unreported:
+                for messages in batches.values():
+                    messages.append("[{} log messages were dropped]".format(self.unreported))
+                self.unreported = 0
+
+            for channelid, messages in batches.items():
+                dest = discord.utils.get(self.bot.get_all_channels(), id=channelid)
+                if dest is None:
+                    continue
+                for chunk in self.pack(messages):
+                    try:
+                        await self.bot.send_message(dest, chunk)
+                    except Exception:
+                        logging.getLogger().exception("Failed to send log message")
+                        break
+                    self.batches += 1
+                self.sent += len(messages)
+
+    def stats(self):
+        return {"pending": len(self.pending),
+                "sent": self.sent,
+                "batches": self.batches,
+                "dropped": self.dropped}
@@ -1,10 +1,15 @@
 import sys
 import logging
-from cachetools import LRUCache
 
 import discord
 
 from botconf import Conf
+from ready_gate import ReadyGate
+from bootstrap import Bootstrap
+from log_queue import setup_logging, LogSender
+from edit_cache import EditCache
+from permission_cache import PermissionCache
+from timings import Timings
 
 from contextBot.Context import Context
 from contextBot.Bot import Bot
@@ -41,18 +46,27 @@ CURRENT_APP = conf.get("APP")
 DB_TYPE = conf.get("DB_TyPE")
 if not DB_TYPE or DB_TYPE.lower() == "sqlite":
     from paradata_sqlite import BotData
-    dbopts = {'data_file': conf.get("bot_data_file")}
+    dbopts = {'data_file': conf.get("bot_data_file"),
+              'profile': conf.get("sqlite_profile"),
+              'group_commit': conf.get("sqlite_group_commit")}
 elif DB_TYPE == "mysql":
     from paradata_mysql import BotData
     dbopts = {
         'username': conf.get('username'),
         'password': conf.get('password'),
         'host': conf.get('host'),
-        'database': conf.get('database')
+        'database': conf.get('database'),
+        'pool_size': conf.get('db_pool_size', 5),
+        'batch_connections': conf.get('db_batch_connections')
     }
 else:
     raise Exception("Unknown data storage type {} in configuration".format(DB_TYPE))
 
+# Optional per-table property cache, e.g. {"default": {"size": 10000, "ttl": 600}}
+dbopts['cache'] = conf.get("db_cache")
+# Optional compression of large values in the long tables, e.g. {"threshold": 1024, "level": 6}
+dbopts['compression'] = conf.get("db_compression")
+
 botdata = BotData(app=CURRENT_APP, **dbopts)
 
 # Initialise the logger
@@ -64,8 +78,8 @@ file_handler = logging.FileHandler(filename=LOGFILE, encoding='utf-8', mode='a')
 term_handler = logging.StreamHandler(sys.stdout)
 file_handler.setFormatter(log_fmt)
 term_handler.setFormatter(log_fmt)
-logger.addHandler(file_handler)
-logger.addHandler(term_handler)
+# Records are written by a background thread, see log_queue
+log_handler, log_listener = setup_logging(logger, [file_handler, term_handler], size=conf.get("log_queue_size", 10000))
 logger.setLevel(logging.INFO)
 
 # -------------------------------
@@ -76,13 +90,21 @@ async def get_prefixes(ctx):
     """
     Returns a list of valid prefixes in this context.
     Currently just bot and server prefixes
+    Prefixes are looked up in the prefix registry once it has been loaded at ready, and in the data before then.
     """
     prefix = 0
-    prefix_conf = ctx.server_conf.guild_prefix
-    if ctx.server:
-        prefix = await prefix_conf.get(ctx)
-    user_prefix = await ctx.bot.data.users.get(ctx.authid, "custom_prefix")
+    start = ctx.bot.objects["timings"].start()
+    if "user_prefixes" in ctx.bot.objects:
+        if ctx.server:
+            prefix = ctx.bot.objects["server_prefixes"].get(ctx.server.id, None)
+        user_prefix = ctx.bot.objects["user_prefixes"].get(ctx.authid, None)
+    else:
+        prefix_conf = ctx.server_conf.guild_prefix
+        if ctx.server:
+            prefix = await prefix_conf.get(ctx)
+        user_prefix = await ctx.bot.data.users.get(ctx.authid, "custom_prefix")
     prefix = prefix if prefix else ctx.bot.prefix
+    ctx.bot.objects["timings"].stop("prefix", "get_prefixes", start)
     return [prefix, user_prefix] if user_prefix else [prefix]
 
 # Initialise the bot
@@ -94,6 +116,9 @@ bot = Bot(data=botdata,
 
 bot.DEBUG = conf.get("DEBUG")
 bot.objects["logfile"] = open(bot.LOGFILE, 'a+')
+bot.objects["bootstrap"] = Bootstrap(backlog=conf.get("ready_backlog", 500))
+bot.objects["log_sender"] = LogSender(bot, interval=conf.get("log_send_interval", 2), backlog=conf.get("log_send_backlog", 200))
+bot.objects["log_handler"] = log_handler
 
 
 async def log(bot, logMessage, chid="Global".center(18, '='), error=False, level=logging.INFO):
@@ -101,11 +126,7 @@ async def log(bot, logMessage, chid="Global".center(18, '='), error=False, level
         logger.log(level, '[{}] {}'.format(chid, line))
 
     if bot.DEBUG > 1:
-        ctx = Context(bot=bot)
-        log_splits = await ctx.msg_split(logMessage, True)
-        dest = discord.utils.get(bot.get_all_channels(), id=ERROR_CHANNEL if error else LOG_CHANNEL)
-        for log in log_splits:
-            await bot.send_message(dest, log)
+        bot.objects["log_sender"].push(ERROR_CHANNEL if error else LOG_CHANNEL, logMessage)
 
 Bot.log = log
 
@@ -181,7 +202,10 @@ emojis = {"emoji_tex_del": "delete",
 # Initialise bot objects
 
 bot.objects["ready"] = False
-bot.objects["command_cache"] = LRUCache(300)
+bot.objects["ready_gate"] = ReadyGate()
+bot.objects["timings"] = Timings(enabled=conf.get("timings_enabled", False), window=conf.get("timings_window", 1000))
+bot.objects["command_cache"] = EditCache(size=conf.get("edit_cache_size", 1000), ttl=conf.get("edit_cache_ttl", 600))
+bot.objects["permission_cache"] = PermissionCache(size=conf.get("permission_cache_size", 100000))
 
 
 # ----Discord event handling----
@@ -233,10 +257,20 @@ async def on_ready():
 
 async def publish_ready(bot):
     bot.objects["ready"] = True
+    bot.objects["ready_gate"].open()
 
+bot.add_after_event("ready", bot.objects["bootstrap"].start, priority=50)
 bot.add_after_event("ready", publish_ready, priority=100)
 # ----Event loops----
 # ----End event loops----
 
 # ----Everything is defined, start the bot!----
-bot.run(conf.get("TOKEN"))
+try:
+    bot.run(conf.get("TOKEN"))
+finally:
+    try:
+        botdata.close()
+    finally:
+        log_listener.stop()
+        if log_handler.dropped:
+            print("Dropped {} log records while the log queue was full.".format(log_handler.dropped), file=sys.stderr)
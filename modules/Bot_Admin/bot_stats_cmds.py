@@ -0,0 +1,182 @@
+from paraCH import paraCH
+
+cmds = paraCH()
+
+"""
+Internal statistics for the bot.
+All commands require manager level permissions.
+
+Commands provided:
+    dbstats:
+        Shows the executor and property cache statistics of the data backend
+    dbindex:
+        Checks that the property lookups of the data backend are served by an index
+    editcache:
+        Shows the size and memory usage of the command edit tracking cache
+    timings:
+        Shows the timing percentiles of the message dispatch stages
+    rawtap:
+        Shows the throughput and drop counters of the raw gateway tap
+    logstats:
+        Shows the backlog and drop counters of the log queue and the log channel sender
+"""
+
+
+@cmds.cmd("dbstats",
+          category="Bot admin",
+          short_help="Shows data backend statistics")
+@cmds.require("manager_perm")
+async def cmd_dbstats(ctx):
+    """
+    Usage:
+        {prefix}dbstats
+    Description:
+        Shows the queue depth and call latency of the database executor, the connection pool usage when pooled,
+        and the size, hit and miss counts of the property cache for each table.
+    """
+    exec_stats = ctx.bot.data.executor_stats()
+    exec_lines = ["Workers: {workers}, queued calls: {queued}, completed calls: {calls}",
+                  "Latency (ms): avg {latency_avg:.2f}, p95 {latency_p95:.2f}, max {latency_max:.2f}",
+                  "Execution (ms): avg {exec_avg:.2f}, p95 {exec_p95:.2f}"]
+    if "pool_size" in exec_stats:
+        exec_lines.append("Pool: {pool_size} connections, {checkouts} checkouts, {waits} waits, {reconnects} reconnects, {batches} open batches")
+    msg = "**Executor**```\n{}\n```".format("\n".join(exec_lines).format(**exec_stats))
+
+    cache_stats = ctx.bot.data.cache_stats()
+    if cache_stats:
+        lines = ["{:<14}{:>14}{:>10}{:>10}{:>8}".format("Table", "Size", "Hits", "Misses", "Rate")]
+        for table, stats in cache_stats.items():
+            lines.append("{:<14}{:>14}{:>10}{:>10}{:>8.1%}".format(table,
+                                                                  "{}/{}".format(stats["size"], stats["maxsize"]),
+                                                                  stats["hits"],
+                                                                  stats["misses"],
+                                                                  stats["hit_rate"]))
+        msg += "**Property cache**```\n{}\n```".format("\n".join(lines))
+    else:
+        msg += "The property cache is not enabled."
+    await ctx.reply(msg)
+
+
+@cmds.cmd("dbindex",
+          category="Bot admin",
+          short_help="Checks the data backend lookups are indexed")
+@cmds.require("manager_perm")
+async def cmd_dbindex(ctx):
+    """
+    Usage:
+        {prefix}dbindex
+    Description:
+        Explains the query plan of the property lookups (find, find_not_empty, find_all) on each table,
+        and reports any lookup which would scan the whole table.
+    """
+    plans = await ctx.bot.data.explain_lookups()
+    unindexed = []
+    for table, lookups in plans.items():
+        for lookup, indexed, plan in lookups:
+            if not indexed:
+                unindexed.append("{}.{}: {}".format(table, lookup, plan))
+    if unindexed:
+        await ctx.reply("**Unindexed lookups**```\n{}\n```".format("\n".join(unindexed)))
+    else:
+        await ctx.reply("All {} property lookups are indexed.".format(sum(len(lookups) for lookups in plans.values())))
+
+
+@cmds.cmd("editcache",
+          category="Bot admin",
+          short_help="Shows command edit cache statistics")
+@cmds.require("manager_perm")
+async def cmd_editcache(ctx):
+    """
+    Usage:
+        {prefix}editcache
+    Description:
+        Shows the size, hit rate and approximate memory usage of the cache of commands
+        which are rerun when their message is edited.
+    """
+    stats = ctx.bot.objects["command_cache"].stats()
+    lines = ["Tracked commands: {size}/{maxsize}, expiring after {ttl} seconds",
+             "Edits: {hits} tracked, {misses} untracked, {hit_rate:.1%} tracked",
+             "Memory: {memory_kb:.1f} KB"]
+    await ctx.reply("**Edit cache**```\n{}\n```".format("\n".join(lines).format(memory_kb=stats["memory"] / 1024, **stats)))
+
+
+@cmds.cmd("timings",
+          category="Bot admin",
+          short_help="Shows message dispatch timings",
+          flags=["on", "off", "reset"])
+@cmds.require("manager_perm")
+async def cmd_timings(ctx):
+    """
+    Usage:
+        {prefix}timings [--on | --off | --reset]
+    Description:
+        Shows the p50, p95 and p99 times of each stage of the message dispatch pipeline,
+        per command, check and message listener, over the most recent calls.
+        Timings are only recorded while enabled.
+    Flags:5
+        on:: Start recording timings.
+        off:: Stop recording timings.
+        reset:: Forget the recorded timings.
+    """
+    timings = ctx.bot.objects["timings"]
+    if ctx.flags["on"] or ctx.flags["off"]:
+        timings.enabled = bool(ctx.flags["on"])
+        await ctx.reply("Timings are now {}.".format("enabled" if timings.enabled else "disabled"))
+        return
+    if ctx.flags["reset"]:
+        timings.reset()
+        await ctx.reply("The recorded timings have been reset.")
+        return
+
+    stats = timings.stats()
+    if not stats:
+        await ctx.reply("No timings have been recorded. Timings are {}.".format("enabled" if timings.enabled else "disabled"))
+        return
+    lines = ["{:<26}{:>8}{:>9}{:>9}{:>9}{:>9}".format("Stage (ms)", "Calls", "p50", "p95", "p99", "max")]
+    for (stage, name), stat in sorted(stats.items()):
+        lines.append("{:<26}{:>8}{:>9.2f}{:>9.2f}{:>9.2f}{:>9.2f}".format("{}:{}".format(stage, name)[:25],
+                                                                         stat["count"],
+                                                                         stat["p50"],
+                                                                         stat["p95"],
+                                                                         stat["p99"],
+                                                                         stat["max"]))
+    await ctx.reply("```\n{}\n```".format("\n".join(lines)), split=True, code=True)
+
+
+@cmds.cmd("rawtap",
+          category="Bot admin",
+          short_help="Shows raw gateway tap statistics")
+@cmds.require("manager_perm")
+async def cmd_rawtap(ctx):
+    """
+    Usage:
+        {prefix}rawtap
+    Description:
+        Shows the number of raw gateway payloads received, filtered, written and dropped by the raw gateway tap,
+        and its write throughput.
+    """
+    if "raw_tap" not in ctx.bot.objects:
+        await ctx.reply("The raw gateway tap is not enabled.")
+        return
+    lines = ["Received: {received}, filtered: {filtered}, buffered: {buffered}",
+             "Written: {written} ({bytes} bytes, {rate:.1f}/s), dropped: {dropped}, failed writes: {write_failures}"]
+    await ctx.reply("**Raw gateway tap**```\n{}\n```".format("\n".join(lines).format(**ctx.bot.objects["raw_tap"].stats())))
+
+
+@cmds.cmd("logstats",
+          category="Bot admin",
+          short_help="Shows logging pipeline statistics")
+@cmds.require("manager_perm")
+async def cmd_logstats(ctx):
+    """
+    Usage:
+        {prefix}logstats
+    Description:
+        Shows the number of log records waiting in the log queue and dropped while it was full,
+        and the number of log channel messages waiting, sent and dropped by the log channel sender.
+    """
+    queue_stats = ctx.bot.objects["log_handler"].stats()
+    sender_stats = ctx.bot.objects["log_sender"].stats()
+    lines = ["Log queue: {queued}/{maxsize} records waiting, {dropped} dropped".format(**queue_stats),
+             "Log channels: {pending} messages waiting, {sent} sent in {batches} messages, {dropped} dropped".format(**sender_stats)]
+    await ctx.reply("**Logging**```\n{}\n```".format("\n".join(lines)))
@@ -157,10 +157,10 @@ async def cmd_userinfo(ctx):
     joined = user.joined_at.strftime("%I:%M %p, %d/%m/%Y")
     created_ago = "({} ago)".format(ctx.strfdelta(datetime.utcnow() - user.created_at, minutes=False))
     created = user.created_at.strftime("%I:%M %p, %d/%m/%Y")
-    usernames = await ctx.bot.data.users_long.get(user.id, "name_history")
+    usernames = [name for ts, name in await ctx.bot.data.users_history.latest(user.id, "name_history", count=11, distinct=True)]
     name_list = "{}{}".format("..., " if len(usernames) > 10 else "",
                               ", ".join(usernames[-10:])) if usernames else "No recent past usernames."
-    nicknames = await ctx.bot.data.members_long.get(ctx.server.id, user.id, "nickname_history")
+    nicknames = [name for ts, name in await ctx.bot.data.members_history.latest(ctx.server.id, user.id, "nickname_history", count=11, distinct=True)]
     nickname_list = "{}{}".format("..., " if len(nicknames) > 10 else "",
                                   ", ".join(nicknames[-10:])) if nicknames else "No recent past nicknames."
     """
@@ -326,7 +326,7 @@ async def cmd_secho(ctx):
     Description:
         Gives information on a text channel, voice channel, or category.
     """
-    valid_channels = [ch for ch in ctx.server.channels if ch.permissions_for(ctx.author).read_messages]
+    valid_channels = [ch for ch in ctx.server.channels if ctx.can_read(ch, ctx.author)]
     ch = await ctx.find_channel(ctx.arg_str, interactive=True, collection=valid_channels)
     if not ch:
         return
@@ -4,36 +4,33 @@ Provides some handlers to save the name and nickname history for users
 Handlers:
     store_names:
         Listens to member updates for name/nickname changes and stores them
-User data:
-    name_history: list
+User history:
+    name_history: str
         (app independent, automatic)
         The previous names of a user
-Member data:
-    nickname_history: list
+Member history:
+    nickname_history: str
         (app independent, automatic)
-        The previous nicknames for a membet
+        The previous nicknames for a member
 """
 
 
 async def store_names(bot, before, after):
-    if before.name != after.name:
-        history = await bot.data.users_long.get(before.id, "name_history")
-        history = history if history else []
-        names = [before.name, after.name]
-        history.extend([name for name in names if name not in history])
-        history = history[-40:]
-        await bot.data.users_long.set(before.id, "name_history", history)
+    if before.name == after.name and before.nick == after.nick:
+        return
 
-    if before.nick != after.nick:
-        history = await bot.data.members_long.get(before.server.id, before.id, "nickname_history")
-        history = history if history else []
-        names = [before.nick, after.nick]
-        history.extend([name for name in names if name not in history and name is not None])
-        history = history[-40:]
-        await bot.data.members_long.set(before.server.id, before.id, "nickname_history", history)
+    # The previous name is appended as well, so the history is complete from the first recorded change
+    # Repeated names are removed when the history is read
+    async with bot.data.batch():
+        if before.name != after.name:
+            await bot.data.users_history.append_many(before.id, "name_history", [before.name, after.name])
+
+        if before.nick != after.nick:
+            names = [name for name in [before.nick, after.nick] if name is not None]
+            await bot.data.members_history.append_many(before.server.id, before.id, "nickname_history", names)
 
 
 def load_into(bot):
-    bot.data.users_long.ensure_exists("name_history")
-    bot.data.members_long.ensure_exists("nickname_history")
+    bot.data.users_history.ensure_exists("name_history", retention=80)
+    bot.data.members_history.ensure_exists("nickname_history", retention=80)
     bot.add_after_event("member_update", store_names)
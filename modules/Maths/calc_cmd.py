@@ -13,6 +13,7 @@ API_ADDR = 'http://api.mathjs.org/v4/'
 @cmds.cmd("calc",
           category="Maths",
           edit_handler=cmds.edit_handler_rerun,
+          slow=True,
           short_help="Calculate short mathematical expressions.")
 async def cmd_rotate(ctx):
     """
@@ -76,7 +76,8 @@ def field_pager(strings):
 @cmds.cmd("nlab",
           category="Maths",
           short_help="Searches the nLab",
-          aliases=["nlablink", "nl"])
+          aliases=["nlablink", "nl"],
+          slow=True)
 async def cmd_nlab(ctx):
     """
     Usage:
@@ -217,7 +217,8 @@ def triage_pods(pod_list):
           category="Maths",
           short_help="Sends a query to Wolfram Alpha",
           aliases=["ask", "wolf", "w", "?w"],
-          edit_handler=cmds.edit_handler_rerun)
+          edit_handler=cmds.edit_handler_rerun,
+          slow=True)
 @cmds.execute("flags", flags=["text"])
 async def cmd_query(ctx):
     """
@@ -1,7 +1,7 @@
 from paraCH import paraCH
 
 
-cmds = paraCH()
+cmds = paraCH(loaders=["prefixes"])
 
 
 @cmds.cmd("prefix",
@@ -25,6 +25,8 @@ async def cmd_tag(ctx):
             await ctx.reply("Sorry, the maximum length of a personal prefix is `5` characters.")
             return
         await ctx.bot.data.users.set(ctx.authid, "custom_prefix", ctx.flags["set"])
+        if "user_prefixes" in ctx.bot.objects:
+            ctx.bot.objects["user_prefixes"][ctx.authid] = ctx.flags["set"]
         await ctx.reply("Your personal custom prefix has been set to `{}`. Mentions and any server custom prefix will still function.".format(ctx.flags["set"]))
         return
 
@@ -36,6 +38,20 @@ async def cmd_tag(ctx):
     await ctx.reply("{}\n{}\n{}".format(personal, server if ctx.server else "", default))
 
 
+async def load_prefixes(bot):
+    """
+    Load the server and personal prefixes into the prefix registry used for prefix detection.
+    """
+    server_prefixes = await bot.data.servers.find_all("guild_prefix")
+    user_prefixes = await bot.data.users.find_all("custom_prefix")
+    bot.objects["server_prefixes"] = {str(serverid): prefix for serverid, prefix in server_prefixes.items()}
+    bot.objects["user_prefixes"] = {str(userid): prefix for userid, prefix in user_prefixes.items()}
+    await bot.log("Loaded {} server prefixes and {} personal prefixes.".format(len(server_prefixes), len(user_prefixes)))
+    return len(server_prefixes) + len(user_prefixes)
+
+
 def load_into(bot):
     bot.data.users.ensure_exists("custom_prefix", shared=False)
     bot.data.servers.ensure_exists("guild_prefix", shared=False)
+
+    bot.objects["bootstrap"].add("prefixes", load_prefixes)
@@ -1,8 +1,9 @@
 from paraCH import paraCH
+from timings import timed
 import discord
 import asyncio
 
-cmds = paraCH()
+cmds = paraCH(loaders=["cleaned_channels"])
 
 
 @cmds.cmd("cleanch",
@@ -30,10 +31,26 @@ async def cmd_cleanch(ctx):
 
 
 async def channel_cleaner(ctx):
+    if await is_cleaned(ctx):
+        await clean_message(ctx)
+
+
+@timed("listener", "channel_cleaner")
+async def is_cleaned(ctx):
+    """
+    Returns whether the message was sent in a cleaned channel.
+    """
     if not ctx.server:
-        return
-    if not (ctx.server.id in ctx.bot.objects["cleaned_channels"] and ctx.ch.id in ctx.bot.objects["cleaned_channels"][ctx.server.id]):
-        return
+        return False
+    if ctx.bot.objects["bootstrap"].defer("cleaned_channels", channel_cleaner, ctx):
+        return False
+    return ctx.server.id in ctx.bot.objects["cleaned_channels"] and ctx.ch.id in ctx.bot.objects["cleaned_channels"][ctx.server.id]
+
+
+async def clean_message(ctx):
+    """
+    Delete the message after 30 seconds, unless it has been pinned.
+    """
     await asyncio.sleep(30)
     if ctx.msg.pinned:
         return
@@ -47,16 +64,18 @@ async def channel_cleaner(ctx):
 
 async def register_channel_cleaners(bot):
     cleaned_channels = {}
+    stored = await bot.data.servers.find_all("clean_channels")
     for server in bot.servers:
-        channels = await bot.data.servers.get(server.id, "clean_channels")
+        channels = stored.get(int(server.id), None)
         if channels:
             cleaned_channels[server.id] = channels
     bot.objects["cleaned_channels"] = cleaned_channels
     await bot.log("Loaded {} servers with channels to clean.".format(len(cleaned_channels)))
+    return len(stored)
 
 
 def load_into(bot):
     bot.data.servers.ensure_exists("clean_channels", shared=False)
 
-    bot.add_after_event("ready", register_channel_cleaners)
+    bot.objects["bootstrap"].add("cleaned_channels", register_channel_cleaners)
     bot.after_ctx_message(channel_cleaner)
@@ -59,10 +59,10 @@ async def log_leave(bot, member):
     info = "{} ({})".format(user, user.id)
     joined_ago = "({} ago)".format(ctx.strfdelta(datetime.utcnow() - user.joined_at))
     joined = user.joined_at.strftime("%I:%M %p, %d/%m/%Y")
-    usernames = await ctx.bot.data.users.get(user.id, "name_history")
+    usernames = [name for ts, name in await ctx.bot.data.users_history.latest(user.id, "name_history", count=11, distinct=True)]
     name_list = "{}{}".format("..., " if len(usernames) > 10 else "",
                               ", ".join(usernames[-10:])) if usernames else "No recent past usernames."
-    nicknames = await ctx.bot.data.members.get(ctx.server.id, user.id, "nickname_history")
+    nicknames = [name for ts, name in await ctx.bot.data.members_history.latest(ctx.server.id, user.id, "nickname_history", count=11, distinct=True)]
     nickname_list = "{}{}".format("..., " if len(nicknames) > 10 else "",
                                   ", ".join(nicknames[-10:])) if nicknames else "No recent past nicknames."
 
@@ -84,8 +84,8 @@ async def log_leave(bot, member):
 
 def load_into(bot):
     bot.data.servers.ensure_exists("joinlog_ch", shared=False)
-    bot.data.users.ensure_exists("name_history", shared=True)
-    bot.data.members.ensure_exists("nickname_history", shared=True)
+    bot.data.users_history.ensure_exists("name_history", retention=80)
+    bot.data.members_history.ensure_exists("nickname_history", retention=80)
 
     bot.add_after_event("member_join", log_join)
     bot.add_after_event("member_remove", log_leave)
@@ -202,10 +202,12 @@ async def cmd_unmute(ctx):
 async def register_scheduled_unmutes(bot):
     scheduled = 0
 
+    stored_unmutes = await bot.data.servers_long.find_all("unmutes")
+    mute_roles = await bot.data.servers.find_all("mute_role")
     for server in bot.servers:
-        unmutes = await bot.data.servers_long.get(server.id, "unmutes")
+        unmutes = stored_unmutes.get(int(server.id), None)
         if unmutes:
-            muteroleid = await bot.data.servers.get(server.id, "mute_role")
+            muteroleid = mute_roles.get(int(server.id), None)
             muterole = discord.utils.get(server.roles, id=muteroleid) if muteroleid else None
             if not muterole:
                 await bot.data.servers_long.set(server.id, "unmutes", None)
@@ -221,6 +223,7 @@ async def register_scheduled_unmutes(bot):
                     asyncio.ensure_future(schedule_unmute(bot, server, member, dur, muterole, embed))
 
     await bot.log("Scheduled {} users to unmute.".format(scheduled))
+    return len(stored_unmutes) + len(mute_roles)
 
 
 async def add_mute_perm(bot, channel):
@@ -243,4 +246,4 @@ def load_into(bot):
     bot.data.servers.ensure_exists("muted_role", "mod_role", shared=True)
     bot.data.servers_long.ensure_exists("unmutes", shared=False)
 
-    bot.add_after_event("ready", register_scheduled_unmutes)
+    bot.objects["bootstrap"].add("scheduled_unmutes", register_scheduled_unmutes)
@@ -41,8 +41,9 @@ async def cmd_profile(ctx):
 
     created_ago = ctx.strfdelta(datetime.utcnow() - user.created_at)
     created = user.created_at.strftime("%I:%M %p, %d/%m/%Y")
-    rep = await ctx.data.users.get(user.id, "rep")
-    given_rep = await ctx.data.users.get(user.id, "given_rep")
+    profile = await ctx.data.users.get_many(user.id, props=["rep", "given_rep", "tz"])
+    rep = profile["rep"]
+    given_rep = profile["given_rep"]
 
     embed = discord.Embed(type="rich", color=user.colour) \
         .set_author(name="{user} ({user.id})".format(user=user),
@@ -58,7 +59,7 @@ async def cmd_profile(ctx):
                    value="{} Received | {} Given".format(rep, given_rep), inline=True) \
         .add_field(name="Premium",
                    value="No", inline=True)
-    tz = await ctx.data.users.get(user.id, "tz")
+    tz = profile["tz"]
     if tz:
         try:
             TZ = timezone(tz)
@@ -132,10 +133,15 @@ async def cmd_rep(ctx):
                 await ctx.reply(msg)
                 return
         rep = await ctx.data.users.get(user.id, "rep")
-        rep = int(rep) + 1 if rep else 1
-        await ctx.data.users.set(user.id, "rep", str(rep))
+        rep = rep + 1 if rep else 1
         given_rep = await ctx.data.users.get(ctx.authid, "given_rep")
-        given_rep = int(given_rep) + 1 if given_rep else 1
-        await ctx.data.users.set(ctx.authid, "given_rep", str(given_rep))
-        await ctx.data.users.set(ctx.authid, "last_rep_time", str(now.strftime('%s')))
+        given_rep = given_rep + 1 if given_rep else 1
+        async with ctx.data.batch():
+            await ctx.data.users.set(user.id, "rep", rep)
+            await ctx.data.users.set_many(ctx.authid, {"given_rep": given_rep,
+                                                       "last_rep_time": now_timestamp})
         await ctx.reply("You have given a reputation point to {}".format(user.mention))
+
+
+def load_into(bot):
+    bot.data.users.ensure_exists("rep", "given_rep", "last_rep_time", shared=True, type="int")
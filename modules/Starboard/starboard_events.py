@@ -12,18 +12,22 @@ star format:
 async def register_starboard_emojis(bot):
     bot.objects["server_starboard_emojis"] = {}
     bot.objects["server_starboards"] = {}
+    emojis = await bot.data.servers.find_all("starboard_emoji")
     for serverid in await bot.data.servers.find("starboard_enabled", True, read=True):
-        emoji = await bot.data.servers.get(str(serverid), "starboard_emoji")
+        emoji = emojis.get(serverid, None)
         emoji = emoji if emoji else bot.s_conf.starboard_emoji.default
         bot.objects["server_starboard_emojis"][str(serverid)] = emoji
         bot.objects["server_starboards"][str(serverid)] = {}
     await bot.log("Loaded {} servers with active starboards.".format(len(bot.objects["server_starboard_emojis"])))
+    return len(emojis) + len(bot.objects["server_starboard_emojis"])
 
 
 async def starboard_listener(bot, reaction, user):
     message = reaction.message
     if not message.server:
         return
+    if bot.objects["bootstrap"].defer("starboards", starboard_listener, bot, reaction, user):
+        return
 
     if message.server.id not in bot.objects["server_starboard_emojis"]:
         return
@@ -78,8 +82,10 @@ async def starboard_listener(bot, reaction, user):
 
 
 def load_into(bot):
-    bot.data.servers.ensure_exists("starboard_channel", "starboard_enabled", "starboard_emoji", shared=False)
+    bot.data.servers.ensure_exists("starboard_channel", "starboard_emoji", shared=False)
+    bot.data.servers.ensure_exists("starboard_enabled", shared=False, type="bool")
+    bot.data.servers.ensure_exists("starboard_threshold", shared=True, type="int")
 
     bot.add_after_event("reaction_add", starboard_listener)
     bot.add_after_event("reaction_remove", starboard_listener)
-    bot.add_after_event("ready", register_starboard_emojis)
+    bot.objects["bootstrap"].add("starboards", register_starboard_emojis)
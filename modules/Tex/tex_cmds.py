@@ -11,8 +11,9 @@ from tex_preamble import tex_pagination
 from tex_help.tex_help import tex_extended_help
 
 from paraCH import paraCH
+from timings import timed
 
-cmds = paraCH()
+cmds = paraCH(loaders=["tex_listeners"])
 
 """
 Commands and handlers for LaTeX compilation, both manual and automatic.
@@ -135,7 +136,8 @@ def _is_tex(msg):
           category="Maths",
           short_help="Renders LaTeX code",
           extended_help=tex_extended_help,
-          aliases=[",", "$", "$$", "align", "latex", "texw", "texsp"])
+          aliases=[",", "$", "$$", "align", "latex", "texw", "texsp"],
+          slow=True)
 @cmds.execute("flags", flags=["config", "keepmsg", "color==", "colour==", "alwaysmath", "allowother", "name"])
 async def cmd_tex(ctx):
     """
@@ -253,8 +255,14 @@ async def cmd_tex(ctx):
 
     # Start the reaction handler
     asyncio.ensure_future(reaction_edit_handler(ctx, out_msg), loop=ctx.bot.loop)
+    ctx.cmd.dispatched(ctx)
+    await hold_latex_message(ctx)
 
-    # Hold the message context in cache for 600 seconds after the last edit or compilation
+
+async def hold_latex_message(ctx):
+    """
+    Hold the message context in cache for 600 seconds after the last edit or compilation
+    """
     if not ctx.objs["latex_source_deleted"]:
         ctx.objs["latex_edit_renew"] = False
         while True:
@@ -265,6 +273,10 @@ async def cmd_tex(ctx):
         ctx.bot.objects["latex_messages"].pop(ctx.msg.id, None)
 
 
+# User settings read on every compilation, see make_latex
+latex_config_props = ["latex_alwaysmath", "latex_colour", "latex_keep_message", "latex_showname", "latex_allowother"]
+
+
 async def parse_tex(ctx, source):
     """
     Extract the LaTeX source code to compile from a raw incoming message containing LaTeX.
@@ -299,7 +311,7 @@ async def parse_tex(ctx, source):
         return source
 
     # Different compilation commands require different source wrappers
-    always = await ctx.bot.data.users.get(ctx.authid, "latex_alwaysmath")
+    always = ctx.objs["latex_config"]["latex_alwaysmath"]
     if ctx.used_cmd_name in ["latex", "texw"] or (ctx.used_cmd_name == "tex" and not always):
         return source
     if ctx.used_cmd_name in ["$", ","] or (ctx.used_cmd_name == "tex" and always):
@@ -316,6 +328,9 @@ async def make_latex(ctx):
     """
     Compile LaTeX, send the output, and handle cleanup
     """
+    # Read the user's compilation settings in one go
+    ctx.objs["latex_config"] = await ctx.data.users.get_many(ctx.authid, props=latex_config_props)
+
     # Strip the command header off the message if required
     source = ctx.msg.clean_content if ctx.objs["latex_listening"] else ctx.msg.clean_content.partition(ctx.used_cmd_name)[2].strip()
     ctx.objs["latex_source"] = await parse_tex(ctx, source)
@@ -325,7 +340,7 @@ async def make_latex(ctx):
     err_msg = ""
 
     # Check if the user wants to keep the source message
-    keep = await ctx.data.users.get(ctx.authid, "latex_keep_message")
+    keep = ctx.objs["latex_config"]["latex_keep_message"]
     keep = keep or (keep is None)
 
     # Make the error message if required
@@ -352,7 +367,7 @@ async def make_latex(ctx):
     ctx.objs["latex_show_emoji"] = ctx.bot.objects["emoji_tex_errors" if error else "emoji_tex_show"]
 
     # Clean up the author's name and store it
-    ctx.objs["latex_name"] = "**{}**:\n".format(ctx.author.name.replace("*", "\\*")) if (await ctx.data.users.get(ctx.authid, "latex_showname")) in [None, True] else ""
+    ctx.objs["latex_name"] = "**{}**:\n".format(ctx.author.name.replace("*", "\\*")) if ctx.objs["latex_config"]["latex_showname"] in [None, True] else ""
 
     # Send the final output, or a failure image if there is no output
     file_name = "tex/staging/{id}/{id}.png".format(id=ctx.authid)
@@ -383,7 +398,7 @@ async def reaction_edit_handler(ctx, out_msg):
     except discord.Forbidden:
         # If we can't react to the message or use external emojis, give up
         return
-    allow_other = await ctx.bot.data.users.get(ctx.authid, "latex_allowother")
+    allow_other = ctx.objs["latex_config"]["latex_allowother"]
 
     # Build a check function to check if a reaction is valid
     def check(reaction, user):
@@ -454,7 +469,7 @@ async def texcomp(ctx):
     """
     source = ctx.objs["latex_source"]
     preamble = await ctx.get_preamble()
-    colour = await ctx.data.users.get(ctx.authid, "latex_colour")
+    colour = ctx.objs["latex_config"]["latex_colour"]
     colour = colour if colour else "default"
     wide = ctx.objs.get("latex_wide", False)
 
@@ -464,20 +479,31 @@ async def texcomp(ctx):
 async def register_tex_listeners(bot):
     bot.objects["user_tex_listeners"] = set([str(userid) for userid in await bot.data.users.find("tex_listening", True, read=True)])
     bot.objects["server_tex_listeners"] = {}
+    maths_channels = await bot.data.servers.find_all("maths_channels")
     for serverid in await bot.data.servers.find("latex_listen_enabled", True, read=True):
-        channels = await bot.data.servers.get(serverid, "maths_channels")
-        bot.objects["server_tex_listeners"][str(serverid)] = channels if channels else []
+        bot.objects["server_tex_listeners"][str(serverid)] = maths_channels.get(serverid, [])
     bot.objects["latex_messages"] = {}
     await bot.log("Loaded {} user tex listeners and {} server tex listeners.".format(len(bot.objects["user_tex_listeners"]), len(bot.objects["server_tex_listeners"])))
+    return len(bot.objects["user_tex_listeners"]) + len(bot.objects["server_tex_listeners"]) + len(maths_channels)
 
 
 async def tex_listener(ctx):
+    if await compile_listening_tex(ctx):
+        await hold_latex_message(ctx)
+
+
+@timed("listener", "tex_listener")
+async def compile_listening_tex(ctx):
+    """
+    Compile the LaTeX in a message from a listening user or server, if any.
+    Returns True if the message was compiled, and should be held for edits.
+    """
     # Handle exit conditions
-    if ctx.author.bot and int(ctx.authid) not in ctx.bot.bot_conf.getintlist("whitelisted_bots"):
+    if ctx.author.bot and int(ctx.authid) not in ctx.bot.bot_conf.getintset("whitelisted_bots"):
         # No listening to non whitelisted bots
         return
-    if "ready" not in ctx.bot.objects or not ctx.bot.objects["ready"]:
-        # If we aren't initialised, fail silently
+    if ctx.bot.objects["bootstrap"].defer("tex_listeners", tex_listener, ctx):
+        # If we aren't initialised, handle the message once we are
         return
     if "latex_handled" in ctx.objs and ctx.objs["latex_handled"]:
         # Message context already has had any latex processed
@@ -491,7 +517,7 @@ async def tex_listener(ctx):
     if ctx.server and (ctx.server.id in ctx.bot.objects["server_tex_listeners"]) and ctx.bot.objects["server_tex_listeners"][ctx.server.id] and not (ctx.ch.id in ctx.bot.objects["server_tex_listeners"][ctx.server.id]):
         # The current channel isn't in the list of math channels for the server
         return
-    if int(ctx.authid) in ctx.bot.bot_conf.getintlist("blacklisted_users"):
+    if int(ctx.authid) in ctx.bot.bot_conf.getintset("blacklisted_users"):
         # The user has been blacklisted from using the bot
         return
 
@@ -516,17 +542,12 @@ async def tex_listener(ctx):
 
     # Start the reaction handler
     asyncio.ensure_future(reaction_edit_handler(ctx, out_msg), loop=ctx.bot.loop)
-    if not ctx.objs["latex_source_deleted"]:
-        ctx.objs["latex_edit_renew"] = False
-        while True:
-            await asyncio.sleep(600)
-            if not ctx.objs["latex_edit_renew"]:
-                break
-            ctx.objs["latex_edit_renew"] = False
-        ctx.bot.objects["latex_messages"].pop(ctx.msg.id, None)
+    return True
 
 
 async def tex_edit_listener(bot, before, after):
+    if bot.objects["bootstrap"].defer("tex_listeners", tex_edit_listener, bot, before, after):
+        return
     if before.id not in bot.objects["latex_messages"]:
         ctx = MCtx(bot=bot, message=after)
         await tex_listener(ctx)
@@ -546,9 +567,11 @@ async def tex_edit_listener(bot, before, after):
 
 
 def load_into(bot):
-    bot.data.users.ensure_exists("tex_listening", "latex_keepmsg", "latex_colour", "latex_alwaysmath", "latex_allowother", "latex_showname", shared=False)
-    bot.data.servers.ensure_exists("maths_channels", "latex_listen_enabled", shared=False)
+    bot.data.users.ensure_exists("latex_keepmsg", "latex_colour", shared=False)
+    bot.data.users.ensure_exists("tex_listening", "latex_alwaysmath", "latex_allowother", "latex_showname", shared=False, type="bool")
+    bot.data.servers.ensure_exists("maths_channels", shared=False)
+    bot.data.servers.ensure_exists("latex_listen_enabled", shared=False, type="bool")
 
-    bot.add_after_event("ready", register_tex_listeners)
+    bot.objects["bootstrap"].add("tex_listeners", register_tex_listeners)
     bot.add_after_event("message_edit", tex_edit_listener)
     bot.after_ctx_message(tex_listener)
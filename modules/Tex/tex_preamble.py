@@ -8,7 +8,7 @@ import discord
 
 from paraCH import paraCH
 
-cmds = paraCH()
+cmds = paraCH(loaders=["preamble_channels", "pending_preambles"])
 
 """
 Handle LaTeX preamble submission and approval/processing
@@ -1650,11 +1650,12 @@ async def load_channels(bot):
 
 async def cache_pending_preambles(bot):
     bot.objects["pending_preambles"] = {}
-    for userid in await bot.data.users_long.find_not_empty("pending_preamble"):
-        submission = await bot.data.users_long.get(userid, "pending_preamble")
-        info = await bot.data.users.get(userid, "pending_preamble_info")
-        if info is not None:
-            bot.objects["pending_preambles"][str(userid)] = (submission, info)
+    submissions = await bot.data.users_long.find_all("pending_preamble")
+    infos = await bot.data.users.find_all("pending_preamble_info")
+    for userid, submission in submissions.items():
+        if userid in infos:
+            bot.objects["pending_preambles"][str(userid)] = (submission, infos[userid])
+    return len(submissions) + len(infos)
 
 
 async def get_preamble(ctx):
@@ -1670,8 +1671,8 @@ async def get_preamble(ctx):
 
 
 def load_into(bot):
-    bot.add_after_event("ready", load_channels, priority=10)
-    bot.add_after_event("ready", cache_pending_preambles, priority=10)
+    bot.objects["bootstrap"].add("preamble_channels", load_channels)
+    bot.objects["bootstrap"].add("pending_preambles", cache_pending_preambles)
     bot.data.users.ensure_exists("pending_preamble_info", shared=True)
     bot.data.users_long.ensure_exists("pending_preamble", "previous_preamble", "latex_preamble", shared=True)
 
@@ -172,12 +172,9 @@ async def cmd_piggybank(ctx):
         [goal <amount>|none]: Sets your goal!
         Or with no arguments, lists your current amount and progress to the goal.
     """
-    bank_amount = await ctx.data.users.get(ctx.authid, "piggybank_amount")
-    transactions = await ctx.data.users_long.get(ctx.authid, "piggybank_history")
-    goal = await ctx.data.users.get(ctx.authid, "piggybank_goal")
-    bank_amount = bank_amount if bank_amount else 0
-    transactions = transactions if transactions else {}
-    goal = goal if goal else 0
+    bank = await ctx.data.users.get_many(ctx.authid, props={"piggybank_amount": 0, "piggybank_goal": 0, "tz": None})
+    bank_amount = bank["piggybank_amount"]
+    goal = bank["piggybank_goal"]
     if ctx.arg_str == "":
         msg = "You have ${:.2f} in your piggybank!".format(bank_amount)
         if goal:
@@ -192,11 +189,11 @@ async def cmd_piggybank(ctx):
         except ValueError:
             await ctx.reply("The amount must be a number!")
             return
-        transactions[now] = {}
-        transactions[now]["amount"] = "{}${:.2f}".format(action, amount)
         bank_amount += amount if action == "+" else -amount
-        await ctx.data.users.set(ctx.authid, "piggybank_amount", bank_amount)
-        await ctx.data.users_long.set(ctx.authid, "piggybank_history", transactions)
+        async with ctx.data.batch():
+            await ctx.data.users.set(ctx.authid, "piggybank_amount", bank_amount)
+            await ctx.data.users_history.append(ctx.authid, "piggybank_history", {"amount": "{}${:.2f}".format(action, amount)},
+                                                timestamp=int(now))
         msg = "${:.2f} has been {} your piggybank. You now have ${:.2f}!".format(amount,
                                                                                  "added to" if action == "+" else "removed from",
                                                                                  bank_amount)
@@ -219,18 +216,19 @@ async def cmd_piggybank(ctx):
         await ctx.data.users.set(ctx.authid, "piggybank_goal", amount)
         await ctx.reply("Your goal has been set to ${}. ".format(amount))
     elif (ctx.params[0] == "list"):
+        transactions = await ctx.data.users_history.latest(ctx.authid, "piggybank_history")
         if len(transactions) == 0:
             await ctx.reply("No transactions to show! Start adding money to your piggy bank with `{}piggybank + <amount>`".format(ctx.used_prefix))
             return
         if (len(ctx.params) == 2) and (ctx.params[1] == "clear"):
-            await ctx.data.users_long.set(ctx.authid, "piggybank_history", {})
+            await ctx.data.users_history.clear(ctx.authid, "piggybank_history")
             await ctx.reply("Your transaction history has been cleared!")
             return
 
         msg = "```\n"
-        for trans in sorted(transactions):
-            trans_time = datetime.utcfromtimestamp(int(trans))
-            tz = await ctx.data.users.get(ctx.authid, "tz")
+        for trans_timestamp, transaction in transactions:
+            trans_time = datetime.utcfromtimestamp(int(trans_timestamp))
+            tz = bank["tz"]
             if tz:
                 try:
                     TZ = timezone(tz)
@@ -240,7 +238,7 @@ async def cmd_piggybank(ctx):
                 TZ = timezone("UTC")
             timestr = '%I:%M %p, %d/%m/%Y (%Z)'
             timestr = TZ.localize(trans_time).strftime(timestr)
-            msg += "{}\t {:^10}\n".format(timestr, str(transactions[trans]["amount"]))
+            msg += "{}\t {:^10}\n".format(timestr, str(transaction["amount"]))
         await ctx.reply(msg + "```", dm=True)
     else:
         await ctx.reply("Usage: {}piggybank [+|- <amount>] | [list] | [goal <amount>|none]".format(ctx.used_prefix))
@@ -438,7 +436,7 @@ async def cmd_names(ctx):
         if not user:
             await ctx.reply("I couldn't find any matching users in this server sorry!")
             return
-    usernames = await ctx.bot.data.users_long.get(user.id, "name_history")
+    usernames = [name for ts, name in await ctx.bot.data.users_history.latest(user.id, "name_history", distinct=True)]
     if not usernames:
         await ctx.reply("I haven't seen this user change their name!")
         return
@@ -446,5 +444,5 @@ async def cmd_names(ctx):
 
 
 def load_into(bot):
-    bot.data.users.ensure_exists("piggybank_amount", "piggybank_goal", shared=False)
-    bot.data.users_long.ensure_exists("piggybank_history", shared=False)
+    bot.data.users.ensure_exists("piggybank_amount", "piggybank_goal", shared=False, type="float")
+    bot.data.users_history.ensure_exists("piggybank_history", shared=False)
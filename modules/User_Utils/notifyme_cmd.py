@@ -5,8 +5,9 @@ import discord
 from pytz import timezone
 
 from paraCH import paraCH
+from timings import timed
 
-cmds = paraCH()
+cmds = paraCH(loaders=["notifyme_listeners"])
 
 skeleton = {
     "server": {"id": 0},
@@ -24,7 +25,18 @@ def wholeword_check(string, substring):
     return substring.strip() in string.translate(punc_trans).split()
 
 
-def check_listen(user, checks, msg_ctx):
+def message_words(string):
+    """
+    Returns the set of whole words in a message, as used by wholeword_check.
+    """
+    return set(string.translate(punc_trans).split())
+
+
+def check_listen(user, checks, msg_ctx, words=None):
+    """
+    Returns whether the message in msg_ctx passes the given checks.
+    words may be given as the precomputed message_words of the message content.
+    """
     result = True
     result = result and ("server" not in checks or msg_ctx.server.id == checks["server"]["id"])
     result = result and ("from" not in checks or msg_ctx.authid == checks["from"]["id"])
@@ -32,15 +44,217 @@ def check_listen(user, checks, msg_ctx):
     result = result and ("rolementions" not in checks or checks["rolementions"]["id"] in msg_ctx.msg.raw_role_mentions)
     result = result and ("contains" not in checks or (
         (checks["contains"]["text"] in msg_ctx.msg.content) and
-        ("whole_word" not in checks["contains"] or wholeword_check(msg_ctx.msg.content, checks['contains']['text']))
+        ("whole_word" not in checks["contains"] or (
+            checks['contains']['text'].strip() in words if words is not None else wholeword_check(msg_ctx.msg.content, checks['contains']['text'])
+        ))
     ))
     result = result and ("in" not in checks or msg_ctx.ch.id == checks["in"]["id"])
     result = result and ("notbot" not in checks or not msg_ctx.author.bot)
     return result
 
 
+class ContainsMatcher:
+    """
+    Aho-Corasick automaton matching every trigger text of a server against a message in one pass.
+    Trigger texts are stored with the triggers requiring them, as {text: [entries]}.
+    The automaton is rebuilt in full on the first match after the set of texts changes.
+    Small sets of texts are matched with plain substring checks instead, which are faster than
+    stepping through the automaton in Python.
+    """
+    # Largest number of texts matched with substring checks
+    scan_limit = 128
+
+    def __init__(self):
+        self.entries = {}
+        self.dirty = False
+
+        self.goto = [{}]  # Transitions of each state
+        self.fail = [0]  # Failure transition of each state
+        self.out = [[]]  # Texts ending at each state
+
+    def add(self, text, entry):
+        if text not in self.entries:
+            self.entries[text] = []
+            self.dirty = True
+        self.entries[text].append(entry)
+
+    def remove_user(self, userid):
+        for text in list(self.entries):
+            entries = [entry for entry in self.entries[text] if entry[0] != userid]
+            if entries:
+                self.entries[text] = entries
+            else:
+                self.entries.pop(text)
+                self.dirty = True
+
+    def build(self):
+        goto = [{}]
+        out = [[]]
+        for text in self.entries:
+            state = 0
+            for char in text:
+                if char not in goto[state]:
+                    goto.append({})
+                    out.append([])
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            out[state].append(text)
+
+        # Breadth first construction of the failure transitions
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for char, child in goto[state].items():
+                queue.append(child)
+                target = fail[state]
+                while target and char not in goto[target]:
+                    target = fail[target]
+                fail[child] = goto[target].get(char, 0) if state else 0
+                out[child] = out[child] + out[fail[child]]
+
+        self.goto, self.fail, self.out = goto, fail, out
+        self.dirty = False
+
+    def match(self, content):
+        """
+        Returns the entries of every trigger text appearing in content.
+        """
+        if not self.entries:
+            return []
+        if len(self.entries) <= self.scan_limit:
+            return [entry for text, entries in self.entries.items() if text in content for entry in entries]
+        if self.dirty:
+            self.build()
+        goto, fail, out = self.goto, self.fail, self.out
+
+        found = set(out[0])
+        state = 0
+        for char in content:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found.update(out[state])
+        return [entry for text in found for entry in self.entries[text]]
+
+
+class NotifyIndex:
+    """
+    Per server index of the notifyme triggers which could fire on a message.
+
+    Each server holds the triggers of the listening users who are members of the server,
+    indexed by the channel, author, mentioned user or mentioned role the trigger requires,
+    otherwise by the text it must contain, or unindexed if the trigger requires none of these.
+    Triggers are stored as (userid, position, check), with position the index of the check in the user's checks.
+    """
+    def __init__(self, bot):
+        self.bot = bot
+        self.servers = {}  # {serverid: {kind: {key: [(userid, position, check)]}, "any": [...]}}
+        self.user_servers = {}  # {userid: set of indexed serverids}
+
+    @staticmethod
+    def index_key(check):
+        """
+        Returns the (kind, key) under which a check is indexed, or None if it is unindexed.
+        """
+        if "in" in check:
+            return ("channel", check["in"]["id"])
+        if "from" in check:
+            return ("author", check["from"]["id"])
+        if "mentions" in check:
+            return ("mention", check["mentions"]["id"])
+        if "rolementions" in check:
+            return ("role", check["rolementions"]["id"])
+        return None
+
+    def _server_index(self, serverid):
+        if serverid not in self.servers:
+            self.servers[serverid] = {"channel": {}, "author": {}, "mention": {}, "role": {},
+                                      "contains": ContainsMatcher(), "any": []}
+        return self.servers[serverid]
+
+    def add_member(self, serverid, userid, checks):
+        """
+        Index the given checks of a user in a server they are a member of.
+        """
+        index = self._server_index(serverid)
+        for position, check in enumerate(checks):
+            if "server" in check and check["server"]["id"] != serverid:
+                continue
+            entry = (userid, position, check)
+            key = self.index_key(check)
+            if key is None and "contains" in check:
+                index["contains"].add(check["contains"]["text"], entry)
+            elif key is None:
+                index["any"].append(entry)
+            else:
+                index[key[0]].setdefault(key[1], []).append(entry)
+        self.user_servers.setdefault(userid, set()).add(serverid)
+
+    def remove_member(self, serverid, userid):
+        """
+        Remove the checks of a user from the index of a server.
+        """
+        index = self.servers.get(serverid, None)
+        if index is not None:
+            index["any"] = [entry for entry in index["any"] if entry[0] != userid]
+            index["contains"].remove_user(userid)
+            for kind in ("channel", "author", "mention", "role"):
+                for key in list(index[kind]):
+                    entries = [entry for entry in index[kind][key] if entry[0] != userid]
+                    if entries:
+                        index[kind][key] = entries
+                    else:
+                        index[kind].pop(key)
+        if userid in self.user_servers:
+            self.user_servers[userid].discard(serverid)
+
+    def set_user(self, userid, checks):
+        """
+        Reindex the checks of a user in every server they are a member of.
+        """
+        for serverid in list(self.user_servers.get(userid, ())):
+            self.remove_member(serverid, userid)
+        self.user_servers.pop(userid, None)
+        if checks:
+            for server in self.bot.servers:
+                if server.get_member(userid) is not None:
+                    self.add_member(server.id, userid, checks)
+
+    def add_server(self, server, listeners):
+        """
+        Index the checks of every listening member of a server.
+        """
+        for userid, listener in listeners.items():
+            if server.get_member(userid) is not None:
+                self.add_member(server.id, userid, listener["checks"])
+
+    def remove_server(self, serverid):
+        self.servers.pop(serverid, None)
+        for servers in self.user_servers.values():
+            servers.discard(serverid)
+
+    def candidates(self, ctx):
+        """
+        Returns a dictionary {userid: [(position, check)]} of the checks which could match the message in ctx.
+        """
+        index = self.servers.get(ctx.server.id, None)
+        if index is None:
+            return {}
+        entry_lists = [index["any"], index["channel"].get(ctx.ch.id, ()), index["author"].get(ctx.authid, ()),
+                       index["contains"].match(ctx.msg.content)]
+        entry_lists.extend(index["mention"].get(userid, ()) for userid in set(ctx.msg.raw_mentions))
+        entry_lists.extend(index["role"].get(roleid, ()) for roleid in set(ctx.msg.raw_role_mentions))
+
+        candidates = {}
+        for entries in entry_lists:
+            for userid, position, check in entries:
+                candidates.setdefault(userid, []).append((position, check))
+        return candidates
+
+
 async def check_can_view(user, ctx):
-    return ctx.ch.permissions_for(ctx.server.get_member(user.id)).read_messages
+    return ctx.can_read(ctx.ch, ctx.server.get_member(user.id))
 
 
 async def check_to_str(ctx, check, markdown=True):
@@ -285,6 +499,7 @@ async def update_checks(ctx, checks):
     listener = listeners[ctx.authid] if ctx.authid in listeners else {"user": ctx.author}
     listener["checks"] = checks
     listeners[ctx.authid] = listener
+    ctx.bot.objects["notifyme_index"].set_user(ctx.authid, checks)
 
 
 async def set_timer(time, flag):
@@ -336,9 +551,9 @@ async def notify_user(user, ctx, check):
 
 async def register_notifyme_listeners(bot):
     bot.objects["notifyme_listeners"] = {}
-    active_listeners = await bot.data.users_long.find_not_empty("notifyme")
+    active_listeners = await bot.data.users_long.find_all("notifyme")
     notifyme_listeners = {}
-    for listener in active_listeners:
+    for listener, check_list in active_listeners.items():
         listener = str(listener)
         try:
             user = await bot.get_user_info(listener)
@@ -346,20 +561,57 @@ async def register_notifyme_listeners(bot):
             continue
         if not user:
             continue
-        check_list = await bot.data.users_long.get(listener, "notifyme")
         notifyme_listeners[listener] = {"user": user, "checks": check_list}
     bot.objects["notifyme_listeners"] = notifyme_listeners
 
+    index = NotifyIndex(bot)
+    for server in bot.servers:
+        index.add_server(server, notifyme_listeners)
+    bot.objects["notifyme_index"] = index
+    return len(active_listeners)
+
 
+async def index_joined_member(bot, member):
+    if bot.objects["bootstrap"].defer("notifyme_listeners", index_joined_member, bot, member):
+        return
+    listener = bot.objects["notifyme_listeners"].get(member.id, None)
+    if listener is not None:
+        bot.objects["notifyme_index"].add_member(member.server.id, member.id, listener["checks"])
+
+
+async def unindex_removed_member(bot, member):
+    if bot.objects["bootstrap"].defer("notifyme_listeners", unindex_removed_member, bot, member):
+        return
+    bot.objects["notifyme_index"].remove_member(member.server.id, member.id)
+
+
+async def index_joined_server(bot, server):
+    if bot.objects["bootstrap"].defer("notifyme_listeners", index_joined_server, bot, server):
+        return
+    bot.objects["notifyme_index"].add_server(server, bot.objects["notifyme_listeners"])
+
+
+async def unindex_removed_server(bot, server):
+    if bot.objects["bootstrap"].defer("notifyme_listeners", unindex_removed_server, bot, server):
+        return
+    bot.objects["notifyme_index"].remove_server(server.id)
+
+
+@timed("listener")
 async def fire_listeners(ctx):
     if not ctx.server:
         return
+    if ctx.bot.objects["bootstrap"].defer("notifyme_listeners", fire_listeners, ctx):
+        return
     listeners = ctx.bot.objects["notifyme_listeners"]
-    active_in_server = [user.id for user in ctx.server.members if user.id in listeners]
-    for userid in active_in_server:
+    candidates = ctx.bot.objects["notifyme_index"].candidates(ctx)
+    words = message_words(ctx.msg.content) if candidates else None
+    for userid, checks in candidates.items():
         listener = listeners[userid]
-        for check in listener["checks"]:
-            if not check_listen(listener["user"], check, ctx):
+        if ctx.server.get_member(userid) is None:
+            continue
+        for position, check in sorted(checks, key=lambda item: item[0]):
+            if not check_listen(listener["user"], check, ctx, words=words):
                 continue
             if not await check_can_view(listener["user"], ctx):
                 continue
@@ -372,5 +624,9 @@ async def fire_listeners(ctx):
 def load_into(bot):
     bot.data.users_long.ensure_exists("notifyme", shared=False)
 
-    bot.add_after_event("ready", register_notifyme_listeners)
+    bot.objects["bootstrap"].add("notifyme_listeners", register_notifyme_listeners)
     bot.after_ctx_message(fire_listeners)
+    bot.add_after_event("member_join", index_joined_member)
+    bot.add_after_event("member_remove", unindex_removed_member)
+    bot.add_after_event("server_join", index_joined_server)
+    bot.add_after_event("server_remove", unindex_removed_server)
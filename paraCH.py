@@ -17,20 +17,24 @@ class paraCH(CommandHandler):
     priority = 1
     CmdCls = paraCMD
 
-    def __init__(self):
+    def __init__(self, loaders=()):
         super().__init__()
         self.raw_cmds = {}  # The raw command listing, with no aliases
+        self.loaders = tuple(loaders)  # Bootstrap loaders the commands rely on, see bootstrap
 
     async def before_exec(self, ctx):
-        if ctx.author.bot and int(ctx.authid) not in ctx.bot.bot_conf.getintlist("whitelisted_bots"):
+        if ctx.author.bot and int(ctx.authid) not in ctx.bot.bot_conf.getintset("whitelisted_bots"):
             ctx.cmd_err = (1, "")
 
-        if "ready" not in ctx.bot.objects or not ctx.bot.objects["ready"]:
+        loaders = ["channel_blacklists", *ctx.cmd.loaders]
+        bootstrap = ctx.bot.objects["bootstrap"]
+        if not ctx.bot.objects["ready_gate"].is_ready() or not all(bootstrap.is_loaded(loader) for loader in loaders):
             await ctx.reply("I have just restarted and am loading myself, please wait!")
-            while "ready" not in ctx.bot.objects or not ctx.bot.objects["ready"]:
-                await asyncio.sleep(1)
+            await ctx.bot.objects["ready_gate"].wait()
+            await bootstrap.wait(*loaders)
 
-        if int(ctx.authid) in ctx.bot.bot_conf.getintlist("blacklisted_users") and ctx.used_cmd_name != "texlisten":
+        start = ctx.bot.objects["timings"].start()
+        if int(ctx.authid) in ctx.bot.bot_conf.getintset("blacklisted_users") and ctx.used_cmd_name != "texlisten":
             ctx.cmd_err = (1, "")
         if ctx.server:
             if (
@@ -44,11 +48,9 @@ class paraCH(CommandHandler):
             if ban_cmds and ctx.cmd.name in ban_cmds:
                 ctx.cmd_err = (1, "")
 
-        try:
-            await ctx.bot.send_typing(ctx.ch)
-        except Exception:
-            pass
-        ctx.bot.objects["command_cache"][ctx.msg.id] = ctx
+        ctx.bot.objects["timings"].stop("before_exec", ctx.cmd.name, start)
+
+        ctx.bot.objects["command_cache"].add(ctx)
 
     def build_cmd(self, name, func, aliases=[], **kwargs):
         cmd = super().build_cmd(name, func, aliases=aliases, **kwargs)
@@ -62,11 +64,10 @@ class paraCH(CommandHandler):
         self.raw_cmds.update(CH.raw_cmds)
 
     @staticmethod
-    async def edit_handler_rerun(ctx, after):
-        asyncio.ensure_future(ctx.safe_delete_msgs(ctx.sent_messages))
-        ctx.update_message(after)
+    async def edit_handler_rerun(ctx, record):
+        asyncio.ensure_future(ctx.safe_delete_msgs(record.sent_messages))
 
-        await ctx.bot.parse_cmd(ctx.used_prefix, ctx)
+        await ctx.bot.parse_cmd(record.prefix, ctx)
 
     async def on_error(self, ctx):
         """
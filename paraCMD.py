@@ -1,7 +1,10 @@
 from contextBot.Command import Command
+import asyncio
 import re
 import textwrap
 
+from flag_parser import FlagParser
+
 
 class paraCMD(Command):
     def __init__(self, name, func, CH, aliases=[], **kwargs):
@@ -9,17 +12,50 @@ class paraCMD(Command):
         self.parse_help()
         self.aliases = aliases
         self.flags = kwargs["flags"] if "flags" in kwargs else None
+        self.flag_parser = FlagParser(self.flags) if self.flags else None
         self.edit_handler = kwargs.get("edit_handler", None)
         self._help_func = kwargs.get("extended_help", None)
+        self.loaders = kwargs.get("loaders", CH.loaders)  # Bootstrap loaders which must have finished before the command runs
+        self.slow = kwargs.get("slow", False)  # Whether to show the typing indicator as soon as the command starts
 
     async def run(self, ctx):
+        timings = ctx.bot.objects["timings"]
         if self.flags:
-            (params, arg_str, flags) = await ctx.parse_flags(ctx.arg_str, self.flags)
+            start = timings.start()
+            (params, arg_str, flags) = self.flag_parser.parse(ctx.arg_str)
             ctx.flags = flags
             ctx.params = params
             ctx.arg_str = arg_str
+            timings.stop("flags", self.name, start)
+
+        ctx.objs["command_start"] = timings.start()
+        ctx.objs["command_typing"] = asyncio.ensure_future(self.typing(ctx))
+        try:
+            await super().run(ctx)
+        finally:
+            self.dispatched(ctx)
+
+    def dispatched(self, ctx):
+        """
+        Mark the command as dispatched, stopping its typing indicator and its timing.
+        Used by commands which keep waiting after they have replied, such as for edits.
+        """
+        if "command_typing" in ctx.objs:
+            ctx.objs.pop("command_typing").cancel()
+        if "command_start" in ctx.objs:
+            ctx.bot.objects["timings"].stop("command", self.name, ctx.objs.pop("command_start"))
 
-        await super().run(ctx)
+    async def typing(self, ctx):
+        """
+        Show the typing indicator, immediately for slow commands,
+        and otherwise once the command has been running for typing_delay seconds.
+        """
+        if not self.slow:
+            await asyncio.sleep(ctx.bot.bot_conf.get("typing_delay", 1))
+        try:
+            await ctx.bot.send_typing(ctx.ch)
+        except Exception:
+            pass
 
     async def help_modifier(self, ctx, embed=None, *args, **kwargs):
         if self._help_func is not None:
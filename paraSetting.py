@@ -11,6 +11,7 @@ class paraSetting(ConfSetting):
     desc = ""  # Human readable description of the setting.
     accept = ""  # Human readable string describing what the acceptable values are.
     category = ""  # Setting category
+    loader = None  # Bootstrap loader which must have finished before the setting is set
 
     write_perm = "in_server_has_mod"  # Require to pass this check before reading a setting
     read_perm = None  # TODO
@@ -72,6 +73,8 @@ class paraSetting(ConfSetting):
         """
         Takes a value, makes it raw, and sets it.
         """
+        if cls.loader:
+            await ctx.bot.objects["bootstrap"].wait(cls.loader)
         raw = value  # Most values should be understood by the db interface, so we can send it on
         return await cls.write(ctx, raw)
 
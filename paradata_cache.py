@@ -0,0 +1,94 @@
+import json
+from cachetools import LRUCache, TTLCache
+
+"""
+Shared in-memory property cache used by the property table manipulators of every data backend.
+
+Each table may be given its own cache, configured with a dictionary of the form
+    {"users": {"size": 10000, "ttl": 600}, "servers": {"size": 5000}, "default": {...}}
+Tables without an entry (and no "default" entry) are not cached.
+"""
+
+
+class PropCache:
+    """
+    A bounded cache mapping (keys..., mapped property) to decoded property values.
+
+    Eviction is least recently used, optionally with a time to live in seconds.
+    Missing values are cached as well, so that repeated reads of unset properties stay off the database.
+    """
+    def __init__(self, size=1000, ttl=None):
+        self.size = size
+        self.ttl = ttl
+        self.cache = TTLCache(size, ttl) if ttl else LRUCache(size)
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Returns a tuple (found, value).
+        Mutable values are returned as fresh copies, so callers may modify them without touching the cache.
+        """
+        try:
+            raw, value = self.cache[key]
+        except KeyError:
+            self.misses += 1
+            return (False, None)
+        self.hits += 1
+        if isinstance(value, (list, dict)):
+            value = json.loads(raw)
+        return (True, value)
+
+    def set(self, key, raw, value):
+        """
+        Store the raw (stored) form and the decoded form of a value.
+        """
+        self.cache[key] = (raw, value)
+
+    def discard(self, key):
+        self.cache.pop(key, None)
+
+    def discard_matching(self, keys, prop):
+        """
+        Discard the cached values of a property for every row whose keys start with the given keys.
+        """
+        prefix = cache_key(keys, prop)[:-1]
+        for key in list(self.cache.keys()):
+            if key[-1] == prop and key[:len(prefix)] == prefix:
+                self.cache.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self.cache
+
+    def clear(self):
+        self.cache.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"size": len(self.cache),
+                "maxsize": self.size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0}
+
+
+def cache_key(keys, prop):
+    """
+    Build a cache key from the row keys and the mapped property.
+    Ids are passed around both as strings and integers, so integer-like keys are normalised.
+    """
+    return (*(int(key) if str(key).isdigit() else key for key in keys), prop)
+
+
+def build_cache(table, cache_opts):
+    """
+    Build the cache for the given table from a cache configuration dictionary, or return None.
+    """
+    if not cache_opts:
+        return None
+    opts = cache_opts.get(table, cache_opts.get("default", None))
+    if not opts or not opts.get("size", 0):
+        return None
+    return PropCache(size=opts["size"], ttl=opts.get("ttl", None))
@@ -0,0 +1,172 @@
+import base64
+import json
+import zlib
+from abc import ABC, abstractmethod
+
+"""
+Value codecs used by the property tables of every data backend.
+
+Properties are stored as JSON in the value column by default.
+Scalar properties may instead be declared with a type through ensure_exists(..., type="int"),
+and are then stored natively in the typed int_value or real_value column.
+Large JSON values may optionally be stored compressed, see CompressedJSONCodec.
+"""
+
+# Columns holding the stored value, in the order they are read and written
+value_columns = ["value", "int_value", "real_value"]
+
+# Format marker prefixing compressed values, which can never start a JSON document
+zlib_marker = b"\x01"
+
+
+def decompress(stored):
+    """
+    Returns the JSON text of a stored JSON value, decompressing it if required.
+    Compressed values are stored as the marker byte followed by the zlib data, either as bytes or as base64 text.
+    """
+    if isinstance(stored, (bytes, bytearray)):
+        if stored[:1] == zlib_marker:
+            return zlib.decompress(stored[1:]).decode("utf-8")
+        return stored.decode("utf-8")
+    if stored and stored[0] == zlib_marker.decode():
+        return zlib.decompress(base64.b64decode(stored[1:])).decode("utf-8")
+    return stored
+
+
+class Codec(ABC):
+    """
+    Converts property values to and from their stored form.
+    column is the column of the property tables holding the stored value.
+    """
+    name = None
+    column = "value"
+
+    @abstractmethod
+    def encode(self, value):
+        """
+        Returns the stored form of a value.
+        """
+
+    @abstractmethod
+    def decode(self, stored):
+        """
+        Returns the value of a stored form, or None for no value.
+        """
+
+    def plain(self, stored):
+        """
+        Returns the uncompressed form of a stored value.
+        """
+        return stored
+
+    def row(self, stored):
+        """
+        Returns the (value, int_value, real_value) columns holding the given stored value.
+        """
+        return tuple(stored if column == self.column else None for column in value_columns)
+
+    def pick(self, row):
+        """
+        Returns the stored value from a (value, int_value, real_value) row.
+        """
+        return row[value_columns.index(self.column)]
+
+
+class JSONCodec(Codec):
+    name = "json"
+    column = "value"
+
+    def encode(self, value):
+        return json.dumps(value)
+
+    def decode(self, stored):
+        stored = decompress(stored)
+        return json.loads(stored) if stored else None
+
+    def plain(self, stored):
+        return decompress(stored)
+
+
+class CompressedJSONCodec(JSONCodec):
+    """
+    JSON codec compressing values of at least threshold characters with zlib.
+    Compressed values are written as bytes when binary is set, and as base64 text otherwise,
+    for backends storing values in text columns.
+    Compressed and uncompressed values may be freely mixed, and are read by every JSON codec.
+    """
+    def __init__(self, threshold=1024, level=6, binary=True):
+        self.threshold = threshold
+        self.level = level
+        self.binary = binary
+
+    def encode(self, value):
+        text = json.dumps(value)
+        if len(text) < self.threshold:
+            return text
+        data = zlib.compress(text.encode("utf-8"), self.level)
+        if self.binary:
+            return zlib_marker + data
+        return zlib_marker.decode() + base64.b64encode(data).decode("ascii")
+
+
+class IntCodec(Codec):
+    name = "int"
+    column = "int_value"
+
+    def encode(self, value):
+        return int(value) if value is not None else None
+
+    def decode(self, stored):
+        return stored
+
+
+class BoolCodec(Codec):
+    name = "bool"
+    column = "int_value"
+
+    def encode(self, value):
+        return int(bool(value)) if value is not None else None
+
+    def decode(self, stored):
+        return bool(stored) if stored is not None else None
+
+
+class FloatCodec(Codec):
+    name = "float"
+    column = "real_value"
+
+    def encode(self, value):
+        return float(value) if value is not None else None
+
+    def decode(self, stored):
+        return stored
+
+
+codecs = {codec.name: codec for codec in [JSONCodec(), IntCodec(), BoolCodec(), FloatCodec()]}
+
+
+def get_codec(name):
+    if name is None:
+        return codecs["json"]
+    if name not in codecs:
+        raise Exception("Unknown property type {}".format(name))
+    return codecs[name]
+
+
+def convert(value, old, new):
+    """
+    Convert a stored value from one codec to another, used when the type of a property changes.
+    Values which cannot be converted are dropped.
+    """
+    try:
+        return new.encode(old.decode(value))
+    except (ValueError, TypeError):
+        return None
+
+
+def app_variants(prop):
+    """
+    LIKE pattern matching the names of a property prefixed with any app, as "{app}_{prop}".
+    Matches should be checked further, as other properties may end with the same name.
+    """
+    return "%\\_" + prop.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
@@ -0,0 +1,95 @@
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+"""
+Shared executor used by the data backends to keep blocking database calls off the event loop.
+"""
+
+
+def current_task():
+    """
+    Returns the running asyncio task, or None outside of a task.
+    """
+    if hasattr(asyncio, "current_task"):
+        try:
+            return asyncio.current_task()
+        except RuntimeError:
+            return None
+    return asyncio.Task.current_task()
+
+
+def percentile(samples, pct):
+    """
+    Nearest-rank percentile of a collection of samples.
+    """
+    if not samples:
+        return 0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class DBExecutor:
+    """
+    Runs blocking database calls on dedicated worker threads.
+
+    With a single worker (the default) every call on a connection is serialised on one thread,
+    so connections which are not thread safe may be used freely.
+    Keeps track of the current queue depth and the latency of recent calls.
+    """
+    def __init__(self, name="db", workers=1, history=1000):
+        self.name = name
+        self.workers = workers
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+
+        self.queued = 0  # Calls submitted from the event loop which have not yet completed
+        self.calls = 0  # Total number of completed calls
+        self.latencies = deque(maxlen=history)  # Time from submission to completion, including queue time
+        self.exec_times = deque(maxlen=history)  # Time spent executing on the worker
+
+    def call(self, func, *args, **kwargs):
+        """
+        Run func on the executor and block until it completes.
+        Used for setup and teardown, where there is no event loop to block.
+        """
+        return self.pool.submit(func, *args, **kwargs).result()
+
+    async def run(self, func, *args):
+        """
+        Run func on the executor without blocking the event loop.
+        """
+        loop = asyncio.get_event_loop()
+        submitted = time.monotonic()
+        self.queued += 1
+        try:
+            return await loop.run_in_executor(self.pool, self._timed, func, args)
+        finally:
+            self.queued -= 1
+            self.calls += 1
+            self.latencies.append(time.monotonic() - submitted)
+
+    def _timed(self, func, args):
+        start = time.monotonic()
+        try:
+            return func(*args)
+        finally:
+            self.exec_times.append(time.monotonic() - start)
+
+    def stats(self):
+        """
+        Returns the queue depth and recent latency statistics, with times in milliseconds.
+        """
+        latencies = list(self.latencies)
+        exec_times = list(self.exec_times)
+        return {"workers": self.workers,
+                "queued": self.queued,
+                "calls": self.calls,
+                "latency_avg": 1000 * sum(latencies) / len(latencies) if latencies else 0,
+                "latency_p95": 1000 * percentile(latencies, 95),
+                "latency_max": 1000 * max(latencies) if latencies else 0,
+                "exec_avg": 1000 * sum(exec_times) / len(exec_times) if exec_times else 0,
+                "exec_p95": 1000 * percentile(exec_times, 95)}
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True)
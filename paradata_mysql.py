@@ -1,5 +1,13 @@
+import asyncio
 import json
 import mysql.connector
+import mysql.connector.pooling
+import time
+from cachetools import LRUCache
+
+from paradata_cache import build_cache, cache_key
+from paradata_codecs import CompressedJSONCodec, app_variants, codecs, convert, get_codec, value_columns
+from paradata_executor import DBExecutor, current_task
 
 prop_table_info = [
     ("users", "users", ["userid"]),
@@ -10,106 +18,759 @@ prop_table_info = [
     ("members_long", "members_long", ["serverid", "userid"])
 ]
 
+history_table_info = [
+    ("users_history", "users_history", ["userid"]),
+    ("members_history", "members_history", ["serverid", "userid"])
+]
+
+# Typed value columns, holding the values of properties declared with a type
+typed_columns = [("int_value", "BIGINT"), ("real_value", "DOUBLE")]
+
+# Number of leading characters of text columns included in the property lookup index
+index_prefix = 64
+
+
+def idempotent(func):
+    """
+    Mark a database call as safe to run again after a dropped connection.
+    Calls which are not marked, such as history appends, are never retried, as they may already have been applied.
+    """
+    func.idempotent = True
+    return func
+
 
 class BotData:
-    def __init__(self, app="", **dbopts):
-        self.conn = mysql.connector.connect(**dbopts)
-        self.conn.autocommit = True
+    def __init__(self, app="", cache=None, compression=None, pool_size=5, batch_connections=None, checkout_timeout=10, **dbopts):
+        # Database calls run on the executor, each with a connection checked out of the pool for the call
+        # Up to pool_size calls may run at once, and up to batch_connections batches may be open at once
+        # The pool holds a connection for every worker and every batch, so a worker never waits on a batch
+        self.pool_size = pool_size
+        self.batch_connections = batch_connections if batch_connections is not None else pool_size
+        self.checkout_timeout = checkout_timeout  # Seconds to wait for a free connection before failing
+        if self.pool_size + self.batch_connections > mysql.connector.pooling.CNX_POOL_MAXSIZE:
+            raise Exception("The MySQL connection pool holds at most {} connections, but pool_size {} and batch_connections {} need {}.".format(
+                mysql.connector.pooling.CNX_POOL_MAXSIZE, self.pool_size, self.batch_connections, self.pool_size + self.batch_connections))
+
+        self.executor = DBExecutor(name="mysql", workers=pool_size)
+        self.pool = self.executor.call(mysql.connector.pooling.MySQLConnectionPool,
+                                       pool_name="paradata{}".format(id(self)),
+                                       pool_size=self.pool_size + self.batch_connections,
+                                       autocommit=True,
+                                       **dbopts)
+
+        self.batches = {}  # Connections held by tasks with an open batch, {task: [connection, depth]}
+        self.batch_slots = None  # Semaphore limiting the number of open batches, created on first use
+        self.checkouts = 0  # Total number of connections checked out of the pool
+        self.waits = 0  # Number of times a checkout had to wait for a connection to be returned
+        self.reconnects = 0  # Number of dropped connections transparently reconnected
+
+        self.tables = []
         for name, table_name, keys in prop_table_info:
-            manipulator = _propTableManipulator(table_name, keys, self.conn, app)
+            manipulator = _propTableManipulator(table_name, keys, self, app,
+                                                cache=build_cache(table_name, cache),
+                                                compression=compression if table_name.endswith("_long") else None)
             self.__setattr__(name, manipulator)
+            self.tables.append(manipulator)
+
+        self.histories = []
+        for name, table_name, keys in history_table_info:
+            manipulator = _historyTableManipulator(table_name, keys, self, app)
+            self.__setattr__(name, manipulator)
+            self.histories.append(manipulator)
+
+    def checkout(self):
+        """
+        Check a connection out of the pool, waiting for one to be returned if they are all in use.
+        The pool checks each connection as it is handed out, and reconnects it if it has been dropped.
+        Runs on the executor thread.
+        """
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            try:
+                conn = self.pool.get_connection()
+                break
+            except mysql.connector.errors.PoolError:
+                if time.monotonic() > deadline:
+                    raise
+                self.waits += 1
+                time.sleep(0.01)
+        self.checkouts += 1
+        return conn
+
+    def release(self, conn):
+        """
+        Return a connection to the pool.
+        The connection is returned even if resetting the session fails, and is then reconnected on its next checkout.
+        """
+        try:
+            conn.close()
+        except mysql.connector.Error:
+            pass
+
+    def _call(self, conn, func, args):
+        """
+        Run func with the given connection, or with a connection checked out of the pool for the call.
+        Runs on the executor thread.
+        """
+        if conn is not None:
+            return func(conn, *args)
+        conn = self.checkout()
+        try:
+            try:
+                return func(conn, *args)
+            except (mysql.connector.errors.InterfaceError, mysql.connector.errors.OperationalError):
+                # The connection was dropped during the call, reconnect and retry once if the call may be repeated
+                if conn.is_connected():
+                    raise
+                self.reconnects += 1
+                conn.reconnect(attempts=3, delay=1)
+                if not getattr(func, "idempotent", False):
+                    raise
+                return func(conn, *args)
+        finally:
+            self.release(conn)
+
+    async def run(self, func, *args):
+        """
+        Run func(connection, *args) on the executor without blocking the event loop.
+        Inside a batch the connection of the batch is used, otherwise a connection is checked out for the call.
+        """
+        batch = self.batches.get(current_task(), None)
+        return await self.executor.run(self._call, batch[0] if batch else None, func, args)
+
+    def call(self, func, *args):
+        """
+        Run func(connection, *args) on the executor and block until it completes.
+        Used for setup and teardown, where there is no event loop to block.
+        """
+        return self.executor.call(self._call, None, func, args)
+
+    def cache_stats(self):
+        """
+        Returns a dictionary of cache statistics for each cached table.
+        """
+        return {table.table: table.cache.stats() for table in self.tables if table.cache is not None}
+
+    async def explain_lookups(self):
+        """
+        Returns a dictionary {table: [(lookup, indexed, plan), ...]} describing how each property lookup is executed.
+        """
+        return {table.table: await self.run(table.explain_lookups) for table in self.tables}
+
+    def executor_stats(self):
+        """
+        Returns the queue depth and call latency statistics of the database executor, along with the pool usage.
+        """
+        stats = self.executor.stats()
+        stats.update({"pool_size": self.pool_size + self.batch_connections,
+                      "checkouts": self.checkouts,
+                      "waits": self.waits,
+                      "reconnects": self.reconnects,
+                      "batches": len(self.batches)})
+        return stats
+
+    def batch(self):
+        """
+        Unit of work grouping the writes made inside it into a single transaction and commit.
+            async with ctx.data.batch():
+                await ctx.data.users.set(...)
+                await ctx.data.members.set(...)
+        The task running the batch holds a single connection until the batch is complete.
+        Writes made before an exception in the block are still committed, as they would be without the batch.
+        """
+        return _batch(self)
+
+    async def begin(self):
+        task = current_task()
+        if task in self.batches:
+            self.batches[task][1] += 1
+            return
+        if self.batch_slots is None:
+            self.batch_slots = asyncio.Semaphore(self.batch_connections)
+        # Wait for a batch connection on the event loop, rather than holding up a worker
+        await self.batch_slots.acquire()
+        try:
+            conn = await self.executor.run(self._open_batch)
+        except Exception:
+            self.batch_slots.release()
+            raise
+        self.batches[task] = [conn, 1]
+
+    async def end(self):
+        task = current_task()
+        batch = self.batches[task]
+        batch[1] -= 1
+        if not batch[1]:
+            self.batches.pop(task)
+            try:
+                await self.executor.run(self._close_batch, batch[0])
+            finally:
+                self.batch_slots.release()
+
+    def _open_batch(self):
+        conn = self.checkout()
+        try:
+            conn.start_transaction()
+        except Exception:
+            self.release(conn)
+            raise
+        return conn
+
+    def _close_batch(self, conn):
+        try:
+            conn.commit()
+        finally:
+            self.release(conn)
 
     def close(self):
-        self.conn.close()
+        # Wait for the running calls to finish and return their connections
+        self.executor.shutdown()
+        for conn, depth in list(self.batches.values()):
+            try:
+                self._close_batch(conn)
+            except mysql.connector.Error:
+                pass
+        self.batches = {}
+        # Close the idle connections held by the pool, by checking each one out and disconnecting it
+        while True:
+            try:
+                conn = self.pool.get_connection()
+            except mysql.connector.Error:
+                break
+            try:
+                conn.disconnect()
+            except mysql.connector.Error:
+                pass
+
+
+class _batch:
+    def __init__(self, data):
+        self.data = data
+
+    async def __aenter__(self):
+        await self.data.begin()
+        return self.data
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.data.end()
 
 
 class _propTableManipulator:
-    def __init__(self, table, keys, conn, app):
+    def __init__(self, table, keys, data, app, cache=None, compression=None):
         self.table = table
         self.keys = keys
-        self.conn = conn
+        self.data = data
         self.app = app
+        self.cache = cache  # Optional PropCache, keyed by (keys..., mapped property)
+        self.writes = {}  # Last pending write for each row key, so writes to the same row are applied in order
+        # Codec for untyped properties, optionally compressing large values
+        self.json_codec = CompressedJSONCodec(binary=False, **compression) if compression else codecs["json"]
+
+        # Property-first lookups on each value column, which should be served by the (property, column, keys...) indexes
+        self.lookups = {}
+        for column in value_columns:
+            suffix = "" if column == "value" else "_{}".format(column)
+            not_empty = "{} IS NOT NULL".format(column) + (" AND value != ''" if column == "value" else "")
+            self.lookups["find" + suffix] = 'SELECT {} FROM {} WHERE property = %s AND {} = %s'.format(self.keys[0], self.table, column)
+            self.lookups["find_not_empty" + suffix] = 'SELECT {} FROM {} WHERE property = %s AND {}'.format(self.keys[0], self.table, not_empty)
+            self.lookups["find_all" + suffix] = 'SELECT {}, {} FROM {} WHERE property = %s AND {}'.format(", ".join(self.keys), column, self.table, not_empty)
 
-        # self.ensure_tables()
-        self.propmap = self.get_propmap()
+        # self.data.call(self.ensure_tables)
+        self.data.call(self.ensure_columns)
+        self.data.call(self.ensure_indexes)
+        self.propmap, self.proptypes = self.data.call(self.get_propmap)
 
-    def ensure_tables(self):
-        cursor = self.conn.cursor()
+    def ensure_tables(self, conn):
+        cursor = conn.cursor()
         keys = "{},".format(", ".join("{} INTEGER NOT NULL".format(key) for key in self.keys)) if self.keys else ""
         key_list = "{},".format(", ".join(self.keys)) if self.keys else ""
-        columns = "{} property TEXT NOT NULL, value TEXT, PRIMARY KEY ({} property)".format(keys, key_list)
+        columns = "{} property TEXT NOT NULL, value TEXT, int_value BIGINT, real_value DOUBLE, PRIMARY KEY ({} property)".format(keys, key_list)
         cursor.execute('CREATE TABLE IF NOT EXISTS {} ({})'.format(self.table, columns))
         cursor.execute('CREATE TABLE IF NOT EXISTS {}_props (property TEXT NOT NULL,\
                        shared BOOLEAN NOT NULL,\
+                       type VARCHAR(16),\
                        PRIMARY KEY (property))'.format(self.table))
 
-    def get_propmap(self):
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT * from {}_props'.format(self.table))
+    def ensure_columns(self, conn):
+        """
+        Add the typed value columns to tables created before they existed.
+        """
+        cursor = conn.cursor()
+        for table, columns in [(self.table, typed_columns), ("{}_props".format(self.table), [("type", "VARCHAR(16)")])]:
+            cursor.execute('SELECT column_name FROM information_schema.columns WHERE table_schema = DATABASE() AND table_name = %s',
+                           (table,))
+            existing = [row[0] for row in cursor.fetchall()]
+            for column, column_type in columns:
+                if column not in existing:
+                    cursor.execute('ALTER TABLE {} ADD COLUMN {} {}'.format(table, column, column_type))
+
+    def ensure_indexes(self, conn):
+        """
+        Create the covering indexes for property-first lookups if they don't already exist.
+        Text columns can only be indexed by prefix, so these are indexed on their first index_prefix characters.
+        """
+        cursor = conn.cursor()
+        cursor.execute('SELECT DISTINCT index_name FROM information_schema.statistics WHERE table_schema = DATABASE() AND table_name = %s',
+                       (self.table,))
+        existing = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute('SELECT column_name, data_type FROM information_schema.columns WHERE table_schema = DATABASE() AND table_name = %s',
+                       (self.table,))
+        types = {row[0]: row[1].lower() for row in cursor.fetchall()}
+        for column in value_columns:
+            index = "{}_property_{}".format(self.table, column)
+            if index in existing:
+                continue
+            columns = ", ".join("{}({})".format(name, index_prefix) if "text" in types.get(name, "") or "blob" in types.get(name, "") else name
+                                for name in ["property", column, *self.keys])
+            cursor.execute('CREATE INDEX {} ON {} ({})'.format(index, self.table, columns))
+
+    def get_propmap(self, conn):
+        cursor = conn.cursor()
+        cursor.execute('SELECT property, shared, type from {}_props'.format(self.table))
         propmap = {}
-        for prop in cursor.fetchall():
-            propmap[prop[0]] = prop[1]
-        return propmap
+        proptypes = {}
+        for prop, shared, prop_type in cursor.fetchall():
+            propmap[prop] = shared
+            codec = get_codec(prop_type)
+            proptypes[prop] = self.json_codec if codec is codecs["json"] else codec
+        return propmap, proptypes
 
     def map_prop(self, prop):
         return "{}_{}".format(self.app, prop) if (prop in self.propmap and not self.propmap[prop] and self.app) else prop
 
-    def ensure_exists(self, *props, shared=True):
+    def owner(self, stored):
+        """
+        Returns the registered property a stored property name belongs to, bare or prefixed with any app.
+        The longest match is used, as an app-prefixed "name_history" also ends with "_history".
+        """
+        matches = [prop for prop in self.propmap if stored == prop or stored.endswith("_" + prop)]
+        return max(matches, key=len) if matches else None
+
+    def prop_codec(self, prop):
+        return self.proptypes.get(prop, self.json_codec)
+
+    def lookup(self, name, codec):
+        return self.lookups[name if codec.column == "value" else "{}_{}".format(name, codec.column)]
+
+    def ensure_exists(self, *props, shared=True, type=None):
+        """
+        Register the given properties, and whether they are shared between apps.
+        type may be one of "int", "bool" or "float" to store the properties natively instead of as JSON.
+        Existing values are converted when the type of a property changes.
+        """
+        self.data.call(self._ensure_exists, props, shared, type)
+
+    def _ensure_exists(self, conn, props, shared, prop_type):
+        codec = get_codec(prop_type) if prop_type is not None else None
+        if codec is codecs["json"]:
+            codec = self.json_codec
         for prop in props:
             if prop in self.propmap:
                 if self.propmap[prop] != shared:
-                    cursor = self.conn.cursor()
+                    cursor = conn.cursor()
                     cursor.execute('UPDATE {}_props SET shared = %s WHERE property = %s'.format(self.table), (shared, prop))
                     self.propmap[prop] = shared
             else:
-                cursor = self.conn.cursor()
-                cursor.execute('INSERT INTO {}_props VALUES (%s,%s)'.format(self.table), (prop, shared))
-                self.propmap = self.get_propmap()
+                cursor = conn.cursor()
+                cursor.execute('INSERT INTO {}_props (property, shared) VALUES (%s, %s)'.format(self.table), (prop, shared))
+                self.propmap, self.proptypes = self.get_propmap(conn)
+            if codec is not None and self.proptypes[prop] is not codec:
+                self._convert_prop(conn, prop, codec)
+
+    def _convert_prop(self, conn, prop, codec):
+        """
+        Convert the stored values of a property to a new codec, in a single transaction.
+        The type is shared by every app, so the app-prefixed values of every app are converted along with the bare values.
+        """
+        old = self.proptypes[prop]
+        criteria = " AND ".join("{} = %s".format(key) for key in [*self.keys, "property"])
+
+        cursor = conn.cursor()
+        conn.start_transaction()
+        try:
+            cursor.execute('SELECT {}, property, value, int_value, real_value FROM {} WHERE property = %s OR property LIKE %s'.format(", ".join(self.keys), self.table),
+                           (prop, app_variants(prop)))
+            rows = [(*codec.row(convert(old.pick(row[-3:]), old, codec)), *row[:-3])
+                    for row in cursor.fetchall() if self.owner(row[-4]) == prop]
+            cursor.executemany('UPDATE {} SET value = %s, int_value = %s, real_value = %s WHERE {}'.format(self.table, criteria), rows)
+            cursor.execute('UPDATE {}_props SET type = %s WHERE property = %s'.format(self.table), (codec.name, prop))
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+        self.proptypes[prop] = codec
+        if self.cache is not None:
+            self.cache.clear()
 
     async def get(self, *args, default=None):
         if len(args) != len(self.keys) + 1:
             raise Exception("Improper number of keys passed to get.")
+        codec = self.prop_codec(args[-1])
         prop = self.map_prop(args[-1])
-        criteria = " AND ".join("{} = %s" for key in args)
+        key = cache_key(args[:-1], prop)
+        if self.cache is not None:
+            found, value = self.cache.get(key)
+            if found:
+                return value if value is not None else default
+
+        stored = codec.plain(await self.data.run(self._get, args[:-1], prop, codec))
+        value = codec.decode(stored)
+        # Don't clobber a value written while this read was queued
+        if self.cache is not None and key not in self.cache:
+            self.cache.set(key, stored, value)
+        return value if value is not None else default
+
+    @idempotent
+    def _get(self, conn, keys, prop, codec):
+        criteria = " AND ".join("{} = %s".format(key) for key in [*self.keys, "property"])
+
+        cursor = conn.cursor()
+        cursor.execute('SELECT {} from {} where {}'.format(codec.column, self.table, criteria), tuple([*keys, prop]))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    async def get_many(self, *keys, props=[]):
+        """
+        Retrieve several properties for the given keys with a single query.
+        props may be a list of property names, or a dictionary mapping property names to their defaults.
+        Returns a dictionary {prop: value}.
+        """
+        if len(keys) != len(self.keys):
+            raise Exception("Improper number of keys passed to get_many.")
+        defaults = props if isinstance(props, dict) else {}
+        mapped = {prop: self.map_prop(prop) for prop in props}
 
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT value from {} where {}'.format(self.table, criteria).format(*self.keys, 'property'), tuple([*args[:-1], prop]))
-        value = cursor.fetchone()
-        return json.loads(value[0]) if (value and value[0]) else default
+        values = {}
+        missing = []
+        for prop, mapped_prop in mapped.items():
+            if self.cache is not None:
+                found, value = self.cache.get(cache_key(keys, mapped_prop))
+                if found:
+                    values[prop] = value
+                    continue
+            missing.append(prop)
+
+        if missing:
+            rows = await self.data.run(self._get_many, keys, [mapped[prop] for prop in missing])
+            for prop in missing:
+                codec = self.prop_codec(prop)
+                stored = codec.plain(codec.pick(rows[mapped[prop]])) if mapped[prop] in rows else None
+                value = codec.decode(stored)
+                key = cache_key(keys, mapped[prop])
+                if self.cache is not None and key not in self.cache:
+                    self.cache.set(key, stored, value)
+                values[prop] = value
+
+        return {prop: values[prop] if values[prop] is not None else defaults.get(prop, None) for prop in props}
+
+    @idempotent
+    def _get_many(self, conn, keys, props):
+        criteria = " AND ".join("{} = %s" for key in keys).format(*self.keys)
+        prop_list = ", ".join("%s" for prop in props)
+
+        cursor = conn.cursor()
+        cursor.execute('SELECT property, value, int_value, real_value from {} where {} AND property IN ({})'.format(self.table, criteria, prop_list), tuple([*keys, *props]))
+        return {row[0]: row[1:] for row in cursor.fetchall()}
 
     async def set(self, *args):
         if len(args) != len(self.keys) + 2:
             raise Exception("Improper number of keys passed to set.")
+        codec = self.prop_codec(args[-2])
         prop = self.map_prop(args[-2])
-        value = json.dumps(args[-1])
-        criteria = " AND ".join("{} = %s" for key in args[:-1])
-        values = ", ".join("%s" for key in args)
 
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT 1 from {} where {}".format(self.table, criteria).format(*self.keys, 'property'), tuple([*args[:-2], prop]))
-        exists = cursor.fetchone()
+        await self._write_values(args[:-2], [(prop, codec, codec.encode(args[-1]))])
 
-        if exists is None:
-            cursor.execute('INSERT INTO {} VALUES ({})'.format(self.table, values), tuple([*args[:-2], prop, value]))
-        else:
-            cursor.execute('UPDATE {} SET value = %s WHERE {}'.format(self.table, criteria).format(*self.keys, 'property'), tuple([value, *args[:-2], prop]))
+    async def set_many(self, *args):
+        """
+        Set several properties for the given keys in a single transaction.
+        The last argument is a dictionary {prop: value}.
+        """
+        if len(args) != len(self.keys) + 1:
+            raise Exception("Improper number of keys passed to set_many.")
+        items = []
+        for prop, value in args[-1].items():
+            codec = self.prop_codec(prop)
+            items.append((self.map_prop(prop), codec, codec.encode(value)))
+
+        await self._write_values(args[:-1], items)
+
+    async def _write_values(self, keys, items):
+        """
+        Write through the cache and then to the database.
+        items is a list of (mapped property, codec, stored value) tuples.
+        """
+        cache_keys = [cache_key(keys, prop) for prop, codec, stored in items]
+        if self.cache is not None:
+            for key, (prop, codec, stored) in zip(cache_keys, items):
+                plain = codec.plain(stored)
+                self.cache.set(key, plain, codec.decode(plain))
+
+        # Calls may run concurrently on different connections, so wait for the previous write to this row
+        row = cache_key(keys, None)
+        previous = self.writes.get(row, None)
+        done = asyncio.Future()
+        self.writes[row] = done
+        try:
+            if previous is not None:
+                await previous
+            await self.data.run(self._set_many, keys, items)
+        except Exception:
+            if self.cache is not None:
+                for key in cache_keys:
+                    self.cache.discard(key)
+            raise
+        finally:
+            done.set_result(None)
+            if self.writes.get(row, None) is done:
+                self.writes.pop(row)
+
+    @idempotent
+    def _set_many(self, conn, keys, items):
+        columns = ", ".join([*self.keys, "property", *value_columns])
+        values = ", ".join("%s" for key in [*self.keys, "property", *value_columns])
+        updates = ", ".join("{0} = VALUES({0})".format(column) for column in value_columns)
+        sql = 'INSERT INTO {} ({}) VALUES ({}) ON DUPLICATE KEY UPDATE {}'.format(self.table, columns, values, updates)
+        rows = [(*keys, prop, *codec.row(stored)) for prop, codec, stored in items]
+
+        cursor = conn.cursor()
+        if len(items) == 1 or conn.in_transaction:
+            cursor.executemany(sql, rows)
+            return
+
+        # The connection autocommits, so group multiple writes in an explicit transaction
+        conn.start_transaction()
+        try:
+            cursor.executemany(sql, rows)
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    async def delete_property(self, *args):
+        """
+        Remove the stored values of a property for every row whose keys start with the given keys.
+            await ctx.data.members_long.delete_property(serverid, "persistent_roles")
+        """
+        if len(args) > len(self.keys) + 1 or not args:
+            raise Exception("Improper number of keys passed to delete_property.")
+        keys = args[:-1]
+        prop = self.map_prop(args[-1])
+
+        # Discard before and after the delete, so reads running alongside it don't leave stale values behind
+        if self.cache is not None:
+            self.cache.discard_matching(keys, prop)
+        await self.data.run(self._delete_property, keys, prop)
+        if self.cache is not None:
+            self.cache.discard_matching(keys, prop)
+
+    @idempotent
+    def _delete_property(self, conn, keys, prop):
+        criteria = " AND ".join("{} = %s".format(key) for key in [*self.keys[:len(keys)], "property"])
+
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM {} WHERE {}'.format(self.table, criteria), (*keys, prop))
 
     async def find(self, prop, value, read=False):
         if len(self.keys) > 1:
             raise Exception("This method cannot currently be used when there are multiple keys")
+        codec = self.prop_codec(prop)
         prop = self.map_prop(prop)
-        if read:
-            value = json.dumps(value)
+        # Typed properties are always looked up by value
+        if read or codec.column != "value":
+            value = codec.encode(value)
+
+        return await self.data.run(self._find, codec, prop, value)
 
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT {} FROM {} WHERE property = %s AND value = %s'.format(self.keys[0], self.table), (prop, value))
+    @idempotent
+    def _find(self, conn, codec, prop, value):
+        cursor = conn.cursor()
+        cursor.execute(self.lookup("find", codec), (prop, value))
         return [value[0] for value in cursor.fetchall()]
 
+    async def find_all(self, prop):
+        """
+        Retrieve every non-empty value of a property with a single query.
+        Returns a dictionary {key: value}, where key is a tuple of the keys for tables with multiple keys.
+        """
+        codec = self.prop_codec(prop)
+        prop = self.map_prop(prop)
+        rows = await self.data.run(self._find_all, codec, prop)
+
+        values = {}
+        for row in rows:
+            value = codec.decode(row[-1])
+            if value is not None:
+                values[row[0] if len(self.keys) == 1 else tuple(row[:-1])] = value
+        return values
+
+    @idempotent
+    def _find_all(self, conn, codec, prop):
+        cursor = conn.cursor()
+        cursor.execute(self.lookup("find_all", codec), (prop,))
+        return cursor.fetchall()
+
     async def find_not_empty(self, prop):
         if len(self.keys) > 1:
             raise Exception("This method cannot currently be used when there are multiple keys")
+        codec = self.prop_codec(prop)
         prop = self.map_prop(prop)
 
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT {} FROM {} WHERE property = %s AND value IS NOT NULL AND value != \'\''.format(self.keys[0], self.table), (prop,))
+        return await self.data.run(self._find_not_empty, codec, prop)
+
+    @idempotent
+    def _find_not_empty(self, conn, codec, prop):
+        cursor = conn.cursor()
+        cursor.execute(self.lookup("find_not_empty", codec), (prop,))
         return [value[0] for value in cursor.fetchall()]
+
+    @idempotent
+    def explain_lookups(self, conn):
+        """
+        Check the query plan of each property-first lookup.
+        Returns a list of (lookup, indexed, plan) tuples.
+        Runs on the executor thread.
+        """
+        results = []
+        cursor = conn.cursor(dictionary=True)
+        for name, sql in self.lookups.items():
+            cursor.execute('EXPLAIN ' + sql, ("",) * sql.count("%s"))
+            rows = cursor.fetchall()
+            plan = "; ".join("{} {} key={}".format(row["table"], row["type"], row["key"]) for row in rows)
+            # A join type of ALL is a full table scan
+            indexed = all(row["type"] != "ALL" and row["key"] for row in rows)
+            results.append((name, indexed, plan))
+        return results
+
+
+class _historyTableManipulator:
+    """
+    Append-only store of timestamped property values, such as name histories and transaction logs.
+    Each append is a single insert, and the oldest rows past a property's retention are pruned periodically.
+    """
+    def __init__(self, table, keys, data, app):
+        self.table = table
+        self.keys = keys
+        self.data = data
+        self.app = app
+
+        self.props = {}  # Declared properties, {prop: (shared, retention)}
+        self.prune_counts = LRUCache(10000)  # Appends since the last prune, keyed by (keys..., mapped property)
+
+        self.data.call(self.ensure_tables)
+
+    def ensure_tables(self, conn):
+        cursor = conn.cursor()
+        keys = ", ".join("{} BIGINT NOT NULL".format(key) for key in self.keys)
+        cursor.execute('CREATE TABLE IF NOT EXISTS {0} (id BIGINT NOT NULL AUTO_INCREMENT, {1}, property VARCHAR(255) NOT NULL, timestamp DOUBLE NOT NULL, value TEXT,\
+                       PRIMARY KEY (id), INDEX {0}_key_timestamp ({2}, property, timestamp))'.format(self.table, keys, ", ".join(self.keys)))
+
+    def ensure_exists(self, *props, shared=True, retention=None):
+        """
+        Declare the given properties, whether they are shared between apps,
+        and the number of most recent entries kept for each key, or None to keep every entry.
+        """
+        for prop in props:
+            self.props[prop] = (shared, retention)
+
+    def map_prop(self, prop):
+        return "{}_{}".format(self.app, prop) if (prop in self.props and not self.props[prop][0] and self.app) else prop
+
+    async def append(self, *args, timestamp=None):
+        """
+        Append a value to the history of a property.
+            await bot.data.users_history.append(userid, "name_history", name)
+        timestamp defaults to the current time.
+        """
+        if len(args) != len(self.keys) + 2:
+            raise Exception("Improper number of keys passed to append.")
+        await self.append_many(*args[:-1], [args[-1]], timestamp=timestamp)
+
+    async def append_many(self, *args, timestamp=None):
+        """
+        Append several values to the history of a property at once, in the order given.
+        The last argument is the list of values.
+        """
+        if len(args) != len(self.keys) + 2:
+            raise Exception("Improper number of keys passed to append_many.")
+        keys = args[:-2]
+        prop = args[-2]
+        mapped = self.map_prop(prop)
+        timestamp = timestamp if timestamp is not None else time.time()
+        rows = [(*keys, mapped, timestamp, json.dumps(value)) for value in args[-1]]
+
+        retention = self.props.get(prop, (True, None))[1]
+        prune = False
+        if retention is not None:
+            key = cache_key(keys, mapped)
+            count = self.prune_counts.get(key, 0) + len(rows)
+            # Prune once a quarter of the retention has been appended, so pruning stays off the common path
+            prune = count >= max(1, retention // 4)
+            self.prune_counts[key] = 0 if prune else count
+
+        await self.data.run(self._append, keys, mapped, rows, retention if prune else None)
+
+    def _append(self, conn, keys, prop, rows, retention):
+        cursor = conn.cursor()
+        if (len(rows) == 1 and retention is None) or conn.in_transaction:
+            self._insert(cursor, keys, prop, rows, retention)
+            return
+
+        # The connection autocommits, so group the statements in an explicit transaction
+        conn.start_transaction()
+        try:
+            self._insert(cursor, keys, prop, rows, retention)
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    def _insert(self, cursor, keys, prop, rows, retention):
+        columns = ", ".join([*self.keys, "property", "timestamp", "value"])
+        values = ", ".join("%s" for column in [*self.keys, "property", "timestamp", "value"])
+        cursor.executemany('INSERT INTO {} ({}) VALUES ({})'.format(self.table, columns, values), rows)
+        if retention is not None:
+            criteria = " AND ".join("{} = %s".format(key) for key in [*self.keys, "property"])
+            # MySQL can't select from the table being deleted from, except through a derived table
+            cursor.execute('DELETE FROM {0} WHERE {1} AND id < (SELECT id FROM (SELECT id FROM {0} WHERE {1} ORDER BY timestamp DESC, id DESC LIMIT 1 OFFSET %s) AS cutoff)'.format(self.table, criteria),
+                           (*keys, prop, *keys, prop, retention - 1))
+
+    async def latest(self, *args, count=None, distinct=False):
+        """
+        Retrieve the most recent entries in the history of a property.
+        Returns a list of (timestamp, value) pairs, oldest first, of at most count entries.
+        With distinct, repeated values are only returned once, at their most recent position.
+        """
+        if len(args) != len(self.keys) + 1:
+            raise Exception("Improper number of keys passed to latest.")
+        rows = await self.data.run(self._latest, args[:-1], self.map_prop(args[-1]), count, distinct)
+        return [(timestamp, json.loads(value)) for timestamp, value in reversed(rows)]
+
+    @idempotent
+    def _latest(self, conn, keys, prop, count, distinct):
+        criteria = " AND ".join("{} = %s".format(key) for key in [*self.keys, "property"])
+        limit = " LIMIT {}".format(int(count)) if count is not None else ""
+
+        cursor = conn.cursor()
+        if distinct:
+            cursor.execute('SELECT MAX(timestamp) AS ts, value FROM {} WHERE {} GROUP BY value ORDER BY ts DESC, MAX(id) DESC{}'.format(self.table, criteria, limit),
+                           (*keys, prop))
+        else:
+            cursor.execute('SELECT timestamp, value FROM {} WHERE {} ORDER BY timestamp DESC, id DESC{}'.format(self.table, criteria, limit),
+                           (*keys, prop))
+        return cursor.fetchall()
+
+    async def clear(self, *args):
+        """
+        Remove the whole history of a property.
+        """
+        if len(args) != len(self.keys) + 1:
+            raise Exception("Improper number of keys passed to clear.")
+        await self.data.run(self._clear, args[:-1], self.map_prop(args[-1]))
+
+    @idempotent
+    def _clear(self, conn, keys, prop):
+        criteria = " AND ".join("{} = %s".format(key) for key in [*self.keys, "property"])
+
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM {} WHERE {}'.format(self.table, criteria), (*keys, prop))
@@ -1,5 +1,12 @@
-import sqlite3 as sq
+import asyncio
 import json
+import sqlite3 as sq
+import time
+from cachetools import LRUCache
+
+from paradata_cache import build_cache, cache_key
+from paradata_codecs import CompressedJSONCodec, app_variants, codecs, convert, get_codec, value_columns
+from paradata_executor import DBExecutor, current_task
 
 prop_table_info = [
         ("users", "users", ["userid"]),
@@ -10,110 +17,660 @@ prop_table_info = [
         ("members_long", "members_long", ["serverid", "userid"])
 ]
 
+history_table_info = [
+        ("users_history", "users_history", ["userid"]),
+        ("members_history", "members_history", ["serverid", "userid"])
+]
+
+# Typed value columns, holding the values of properties declared with a type
+typed_columns = [("int_value", "INTEGER"), ("real_value", "REAL")]
+
+# Connection settings which may be given in a performance profile, applied as PRAGMAs on connection
+profile_pragmas = ["journal_mode", "synchronous", "mmap_size", "cache_size"]
+
+# Recommended profile, e.g. {"journal_mode": "WAL", "synchronous": "NORMAL", "mmap_size": 268435456, "cache_size": -65536}
+# With WAL and synchronous NORMAL a power loss may lose the last few commits, but never corrupts the database.
+performance_profile = {"journal_mode": "WAL",
+                       "synchronous": "NORMAL",
+                       "mmap_size": 268435456,
+                       "cache_size": -65536}
+
 
 class BotData:
-    def __init__(self, app="", data_file="data.db"):
-        self.conn = sq.connect(data_file, timeout=20)
+    def __init__(self, app="", data_file="data.db", cache=None, profile=None, group_commit=None, compression=None):
+        # All access to the connection happens on the executor thread, off the event loop
+        self.executor = DBExecutor(name="sqlite")
+        self.conn = self.executor.call(sq.connect, data_file, timeout=20, check_same_thread=False)
+        # Open batches, as {task: depth}, writes are only committed when there are none
+        # There is a single connection and transaction, so batches of different tasks run one at a time
+        self.batches = {}
+        self.batch_lock = None  # Lock held by the task with an open batch, created on first use
+
+        # Optional connection profile, either a dictionary of pragma settings or True for the performance profile
+        if profile:
+            self.executor.call(self.apply_profile, performance_profile if profile is True else profile)
+
+        # Optional group commit, e.g. {"interval": 100, "writes": 500}
+        # Writes are left in the open transaction and committed every interval ms, or once writes have accumulated.
+        self.group_commit = None
+        if group_commit:
+            self.group_commit = {"interval": group_commit.get("interval", 100),
+                                 "writes": group_commit.get("writes", 500)}
+        self.pending_writes = 0  # Writes in the open transaction waiting for a group commit
+        self.flush_task = None
+        self.closed = False  # Set on close, stopping the group commit task without touching the event loop
+
+        self.tables = []
         for name, table_name, keys in prop_table_info:
-            manipulator = _propTableManipulator(table_name, keys, self.conn, app)
+            manipulator = _propTableManipulator(table_name, keys, self, app,
+                                                cache=build_cache(table_name, cache),
+                                                compression=compression if table_name.endswith("_long") else None)
             self.__setattr__(name, manipulator)
+            self.tables.append(manipulator)
 
-    def close(self):
+        self.histories = []
+        for name, table_name, keys in history_table_info:
+            manipulator = _historyTableManipulator(table_name, keys, self, app)
+            self.__setattr__(name, manipulator)
+            self.histories.append(manipulator)
+
+    def apply_profile(self, profile):
+        """
+        Apply the given pragma settings to the connection.
+        Runs on the executor thread.
+        """
+        cursor = self.conn.cursor()
+        for pragma in profile_pragmas:
+            if pragma in profile:
+                cursor.execute("PRAGMA {} = {}".format(pragma, profile[pragma]))
+
+    def cache_stats(self):
+        """
+        Returns a dictionary of cache statistics for each cached table.
+        """
+        return {table.table: table.cache.stats() for table in self.tables if table.cache is not None}
+
+    async def explain_lookups(self):
+        """
+        Returns a dictionary {table: [(lookup, indexed, plan), ...]} describing how each property lookup is executed.
+        """
+        return {table.table: await self.executor.run(table.explain_lookups) for table in self.tables}
+
+    def executor_stats(self):
+        """
+        Returns the queue depth and call latency statistics of the database executor.
+        """
+        return self.executor.stats()
+
+    def batch(self):
+        """
+        Unit of work grouping the writes made inside it into a single transaction and commit.
+            async with ctx.data.batch():
+                await ctx.data.users.set(...)
+                await ctx.data.members.set(...)
+        Writes made before an exception in the block are still committed, as they would be without the batch.
+        A batch opened while another task has a batch open waits for that batch to complete.
+        """
+        return _batch(self)
+
+    async def begin(self):
+        task = current_task()
+        if task in self.batches:
+            self.batches[task] += 1
+            return
+        if self.batch_lock is None:
+            self.batch_lock = asyncio.Lock()
+        await self.batch_lock.acquire()
+        self.batches[task] = 1
+
+    async def end(self):
+        task = current_task()
+        self.batches[task] -= 1
+        if not self.batches[task]:
+            self.batches.pop(task)
+            try:
+                await self.executor.run(self.commit)
+                self.wrote()
+            finally:
+                self.batch_lock.release()
+
+    def commit(self):
+        """
+        Commit the current transaction, unless writes are being grouped by a batch or a group commit.
+        Runs on the executor thread.
+        """
+        if self.batches:
+            return
+        if self.group_commit:
+            self.pending_writes += 1
+            if self.pending_writes < self.group_commit["writes"]:
+                return
+        self.flush()
+
+    def rollback(self):
+        """
+        Roll back the current transaction, unless writes are being grouped by a batch or a group commit.
+        Runs on the executor thread.
+        A failed statement does not affect the rest of the transaction, so grouped writes are left to be committed.
+        """
+        if not self.batches and not self.group_commit:
+            self.conn.rollback()
+
+    def flush(self):
+        """
+        Commit the open transaction, including any writes waiting for a group commit.
+        Runs on the executor thread.
+        """
         self.conn.commit()
-        self.conn.close()
+        self.pending_writes = 0
+
+    def wrote(self):
+        """
+        Called from the event loop after a write, to start the group commit task if required.
+        """
+        if self.group_commit and self.flush_task is None and not self.closed:
+            self.flush_task = asyncio.ensure_future(self._flush_loop())
+
+    async def _flush_loop(self):
+        while not self.closed:
+            await asyncio.sleep(self.group_commit["interval"] / 1000)
+            if self.pending_writes and not self.batches and not self.closed:
+                await self.executor.run(self.flush)
+
+    def close(self):
+        # The event loop may already be closed, so the group commit task is stopped through the flag
+        self.closed = True
+        self.flush_task = None
+        self.executor.call(self.flush)
+        self.executor.call(self.conn.close)
+        self.executor.shutdown()
+
+
+class _batch:
+    def __init__(self, data):
+        self.data = data
+
+    async def __aenter__(self):
+        await self.data.begin()
+        return self.data
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.data.end()
 
 
 class _propTableManipulator:
-    def __init__(self, table, keys, conn, app):
+    def __init__(self, table, keys, data, app, cache=None, compression=None):
         self.table = table
         self.keys = keys
-        self.conn = conn
+        self.data = data
+        self.conn = data.conn
         self.app = app
+        self.executor = data.executor
+        self.cache = cache  # Optional PropCache, keyed by (keys..., mapped property)
+        # Codec for untyped properties, optionally compressing large values
+        self.json_codec = CompressedJSONCodec(binary=True, **compression) if compression else codecs["json"]
 
-        self.ensure_tables()
-        self.propmap = self.get_propmap()
+        # Property-first lookups on each value column, which should be served by the (property, column, keys...) indexes
+        self.lookups = {}
+        for column in value_columns:
+            suffix = "" if column == "value" else "_{}".format(column)
+            not_empty = "{} IS NOT NULL".format(column) + (" AND value != ''" if column == "value" else "")
+            self.lookups["find" + suffix] = 'SELECT {} FROM {} WHERE property = ? AND {} = ?'.format(self.keys[0], self.table, column)
+            self.lookups["find_not_empty" + suffix] = 'SELECT {} FROM {} WHERE property = ? AND {}'.format(self.keys[0], self.table, not_empty)
+            self.lookups["find_all" + suffix] = 'SELECT {}, {} FROM {} WHERE property = ? AND {}'.format(", ".join(self.keys), column, self.table, not_empty)
+
+        self.executor.call(self.ensure_tables)
+        self.propmap, self.proptypes = self.executor.call(self.get_propmap)
 
     def ensure_tables(self):
         cursor = self.conn.cursor()
         keys = "{},".format(", ".join("{} INTEGER NOT NULL".format(key) for key in self.keys)) if self.keys else ""
         key_list = "{},".format(", ".join(self.keys)) if self.keys else ""
-        columns = "{} property TEXT NOT NULL, value TEXT, PRIMARY KEY ({} property)".format(keys, key_list)
+        columns = "{} property TEXT NOT NULL, value TEXT, int_value INTEGER, real_value REAL, PRIMARY KEY ({} property)".format(keys, key_list)
         cursor.execute('CREATE TABLE IF NOT EXISTS {} ({})'.format(self.table, columns))
         cursor.execute('CREATE TABLE IF NOT EXISTS {}_props (property TEXT NOT NULL,\
                        shared BOOLEAN NOT NULL,\
+                       type TEXT,\
                        PRIMARY KEY (property))'.format(self.table))
+
+        # Add the typed value columns to tables created before they existed
+        existing = [row[1] for row in cursor.execute('PRAGMA table_info({})'.format(self.table)).fetchall()]
+        for column, column_type in typed_columns:
+            if column not in existing:
+                cursor.execute('ALTER TABLE {} ADD COLUMN {} {}'.format(self.table, column, column_type))
+        existing = [row[1] for row in cursor.execute('PRAGMA table_info({}_props)'.format(self.table)).fetchall()]
+        if "type" not in existing:
+            cursor.execute('ALTER TABLE {}_props ADD COLUMN type TEXT'.format(self.table))
+
+        # Covering indexes for property-first lookups, also created on existing tables
+        # The values in the long tables are too large to copy into an index, so those are only indexed by property
+        # The typed columns are only set for typed properties, so their indexes only hold those rows
+        if self.table.endswith("_long"):
+            cursor.execute('DROP INDEX IF EXISTS {}_property_value'.format(self.table))
+            cursor.execute('CREATE INDEX IF NOT EXISTS {0}_property_keys ON {0} (property, {1})'.format(self.table, ", ".join(self.keys)))
+        else:
+            cursor.execute('CREATE INDEX IF NOT EXISTS {0}_property_value ON {0} (property, value, {1})'.format(self.table, ", ".join(self.keys)))
+        for column, column_type in typed_columns:
+            cursor.execute('CREATE INDEX IF NOT EXISTS {0}_property_{2} ON {0} (property, {2}, {1}) WHERE {2} IS NOT NULL'.format(self.table, ", ".join(self.keys), column))
         self.conn.commit()
 
     def get_propmap(self):
         cursor = self.conn.cursor()
-        cursor.execute('SELECT * from {}_props'.format(self.table))
+        cursor.execute('SELECT property, shared, type from {}_props'.format(self.table))
         propmap = {}
-        for prop in cursor.fetchall():
-            propmap[prop[0]] = prop[1]
-        return propmap
+        proptypes = {}
+        for prop, shared, prop_type in cursor.fetchall():
+            propmap[prop] = shared
+            codec = get_codec(prop_type)
+            proptypes[prop] = self.json_codec if codec is codecs["json"] else codec
+        return propmap, proptypes
 
     def map_prop(self, prop):
         return "{}_{}".format(self.app, prop) if (prop in self.propmap and not self.propmap[prop] and self.app) else prop
 
-    def ensure_exists(self, *props, shared=True):
+    def owner(self, stored):
+        """
+        Returns the registered property a stored property name belongs to, bare or prefixed with any app.
+        The longest match is used, as an app-prefixed "name_history" also ends with "_history".
+        """
+        matches = [prop for prop in self.propmap if stored == prop or stored.endswith("_" + prop)]
+        return max(matches, key=len) if matches else None
+
+    def prop_codec(self, prop):
+        return self.proptypes.get(prop, self.json_codec)
+
+    def lookup(self, name, codec):
+        return self.lookups[name if codec.column == "value" else "{}_{}".format(name, codec.column)]
+
+    def ensure_exists(self, *props, shared=True, type=None):
+        """
+        Register the given properties, and whether they are shared between apps.
+        type may be one of "int", "bool" or "float" to store the properties natively instead of as JSON.
+        Existing values are converted when the type of a property changes.
+        """
+        self.executor.call(self._ensure_exists, props, shared, type)
+
+    def _ensure_exists(self, props, shared, prop_type):
+        codec = get_codec(prop_type) if prop_type is not None else None
+        if codec is codecs["json"]:
+            codec = self.json_codec
         for prop in props:
             if prop in self.propmap:
                 if self.propmap[prop] != shared:
                     cursor = self.conn.cursor()
                     cursor.execute('UPDATE {}_props SET shared = ? WHERE property = ?'.format(self.table), (shared, prop))
                     self.propmap[prop] = shared
-                    self.conn.commit()
+                    self.data.commit()
             else:
                 cursor = self.conn.cursor()
-                cursor.execute('INSERT INTO {}_props VALUES (?, ?)'.format(self.table), (prop, shared))
-                self.propmap = self.get_propmap()
-                self.conn.commit()
+                cursor.execute('INSERT INTO {}_props (property, shared) VALUES (?, ?)'.format(self.table), (prop, shared))
+                self.propmap, self.proptypes = self.get_propmap()
+                self.data.commit()
+            if codec is not None and self.proptypes[prop] is not codec:
+                self._convert_prop(prop, codec)
+
+    def _convert_prop(self, prop, codec):
+        """
+        Convert the stored values of a property to a new codec.
+        The type is shared by every app, so the app-prefixed values of every app are converted along with the bare values.
+        """
+        old = self.proptypes[prop]
+        criteria = " AND ".join("{} = ?".format(key) for key in [*self.keys, "property"])
+
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT {}, property, value, int_value, real_value FROM {} WHERE property = ? OR property LIKE ? ESCAPE '\\'".format(", ".join(self.keys), self.table),
+                       (prop, app_variants(prop)))
+        rows = [(*codec.row(convert(old.pick(row[-3:]), old, codec)), *row[:-3])
+                for row in cursor.fetchall() if self.owner(row[-4]) == prop]
+        cursor.executemany('UPDATE {} SET value = ?, int_value = ?, real_value = ? WHERE {}'.format(self.table, criteria), rows)
+        cursor.execute('UPDATE {}_props SET type = ? WHERE property = ?'.format(self.table), (codec.name, prop))
+        self.proptypes[prop] = codec
+        if self.cache is not None:
+            self.cache.clear()
+        self.data.commit()
 
     async def get(self, *args, default=None):
         if len(args) != len(self.keys) + 1:
             raise Exception("Improper number of keys passed to get.")
+        codec = self.prop_codec(args[-1])
         prop = self.map_prop(args[-1])
-        criteria = " AND ".join("{} = ?" for key in args)
+        key = cache_key(args[:-1], prop)
+        if self.cache is not None:
+            found, value = self.cache.get(key)
+            if found:
+                return value if value is not None else default
+
+        stored = codec.plain(await self.executor.run(self._get, args[:-1], prop, codec))
+        value = codec.decode(stored)
+        # Don't clobber a value written while this read was queued
+        if self.cache is not None and key not in self.cache:
+            self.cache.set(key, stored, value)
+        return value if value is not None else default
+
+    def _get(self, keys, prop, codec):
+        criteria = " AND ".join("{} = ?".format(key) for key in [*self.keys, "property"])
 
         cursor = self.conn.cursor()
-        cursor.execute('SELECT value from {} where {}'.format(self.table, criteria).format(*self.keys, 'property'), tuple([*args[:-1], prop]))
-        value = cursor.fetchone()
-        return json.loads(value[0]) if (value and value[0]) else default
+        cursor.execute('SELECT {} from {} where {}'.format(codec.column, self.table, criteria), tuple([*keys, prop]))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    async def get_many(self, *keys, props=[]):
+        """
+        Retrieve several properties for the given keys with a single query.
+        props may be a list of property names, or a dictionary mapping property names to their defaults.
+        Returns a dictionary {prop: value}.
+        """
+        if len(keys) != len(self.keys):
+            raise Exception("Improper number of keys passed to get_many.")
+        defaults = props if isinstance(props, dict) else {}
+        mapped = {prop: self.map_prop(prop) for prop in props}
+
+        values = {}
+        missing = []
+        for prop, mapped_prop in mapped.items():
+            if self.cache is not None:
+                found, value = self.cache.get(cache_key(keys, mapped_prop))
+                if found:
+                    values[prop] = value
+                    continue
+            missing.append(prop)
+
+        if missing:
+            rows = await self.executor.run(self._get_many, keys, [mapped[prop] for prop in missing])
+            for prop in missing:
+                codec = self.prop_codec(prop)
+                stored = codec.plain(codec.pick(rows[mapped[prop]])) if mapped[prop] in rows else None
+                value = codec.decode(stored)
+                key = cache_key(keys, mapped[prop])
+                if self.cache is not None and key not in self.cache:
+                    self.cache.set(key, stored, value)
+                values[prop] = value
+
+        return {prop: values[prop] if values[prop] is not None else defaults.get(prop, None) for prop in props}
+
+    def _get_many(self, keys, props):
+        criteria = " AND ".join("{} = ?" for key in keys).format(*self.keys)
+        prop_list = ", ".join("?" for prop in props)
+
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT property, value, int_value, real_value from {} where {} AND property IN ({})'.format(self.table, criteria, prop_list), tuple([*keys, *props]))
+        return {row[0]: row[1:] for row in cursor.fetchall()}
 
     async def set(self, *args):
         if len(args) != len(self.keys) + 2:
             raise Exception("Improper number of keys passed to set.")
+        codec = self.prop_codec(args[-2])
         prop = self.map_prop(args[-2])
-        value = json.dumps(args[-1])
-        criteria = " AND ".join("{} = ?" for key in args[:-1])
-        values = ", ".join("?" for key in args)
+
+        await self._write_values(args[:-2], [(prop, codec, codec.encode(args[-1]))])
+
+    async def set_many(self, *args):
+        """
+        Set several properties for the given keys in a single transaction.
+        The last argument is a dictionary {prop: value}.
+        """
+        if len(args) != len(self.keys) + 1:
+            raise Exception("Improper number of keys passed to set_many.")
+        items = []
+        for prop, value in args[-1].items():
+            codec = self.prop_codec(prop)
+            items.append((self.map_prop(prop), codec, codec.encode(value)))
+
+        await self._write_values(args[:-1], items)
+
+    async def _write_values(self, keys, items):
+        """
+        Write through the cache and then to the database.
+        items is a list of (mapped property, codec, stored value) tuples.
+        """
+        cache_keys = [cache_key(keys, prop) for prop, codec, stored in items]
+        if self.cache is not None:
+            for key, (prop, codec, stored) in zip(cache_keys, items):
+                plain = codec.plain(stored)
+                self.cache.set(key, plain, codec.decode(plain))
+        try:
+            await self.executor.run(self._set_many, keys, items)
+        except Exception:
+            if self.cache is not None:
+                for key in cache_keys:
+                    self.cache.discard(key)
+            raise
+        self.data.wrote()
+
+    def _set_many(self, keys, items):
+        key_list = ", ".join([*self.keys, "property"])
+        values = ", ".join("?" for key in [*self.keys, "property", *value_columns])
+        updates = ", ".join("{0} = excluded.{0}".format(column) for column in value_columns)
 
         cursor = self.conn.cursor()
-        cursor.execute('SELECT EXISTS(SELECT 1 from {} where {})'.format(self.table, criteria).format(*self.keys, 'property'), tuple([*args[:-2], prop]))
-        exists = cursor.fetchone()
+        try:
+            cursor.executemany('INSERT INTO {0} ({1}, {2}) VALUES ({3}) ON CONFLICT({1}) DO UPDATE SET {4}'.format(self.table, key_list, ", ".join(value_columns), values, updates),
+                               [(*keys, prop, *codec.row(stored)) for prop, codec, stored in items])
+        except Exception:
+            self.data.rollback()
+            raise
+        self.data.commit()
 
-        if not exists[0]:
-            cursor.execute('INSERT INTO {} VALUES ({})'.format(self.table, values), tuple([*args[:-2], prop, value]))
-        else:
-            cursor.execute('UPDATE {} SET value = ? WHERE {}'.format(self.table, criteria).format(*self.keys, 'property'), tuple([value, *args[:-2], prop]))
-        self.conn.commit()
+    async def delete_property(self, *args):
+        """
+        Remove the stored values of a property for every row whose keys start with the given keys.
+            await ctx.data.members_long.delete_property(serverid, "persistent_roles")
+        """
+        if len(args) > len(self.keys) + 1 or not args:
+            raise Exception("Improper number of keys passed to delete_property.")
+        keys = args[:-1]
+        prop = self.map_prop(args[-1])
+
+        # Discard before and after the delete, so reads queued before it don't leave stale values behind
+        if self.cache is not None:
+            self.cache.discard_matching(keys, prop)
+        await self.executor.run(self._delete_property, keys, prop)
+        if self.cache is not None:
+            self.cache.discard_matching(keys, prop)
+        self.data.wrote()
+
+    def _delete_property(self, keys, prop):
+        criteria = " AND ".join("{} = ?".format(key) for key in [*self.keys[:len(keys)], "property"])
+
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute('DELETE FROM {} WHERE {}'.format(self.table, criteria), (*keys, prop))
+        except Exception:
+            self.data.rollback()
+            raise
+        self.data.commit()
 
     async def find(self, prop, value, read=False):
         if len(self.keys) > 1:
             raise Exception("This method cannot currently be used when there are multiple keys")
+        codec = self.prop_codec(prop)
         prop = self.map_prop(prop)
-        if read:
-            value = json.dumps(value)
+        # Typed properties are always looked up by value
+        if read or codec.column != "value":
+            value = codec.encode(value)
+
+        return await self.executor.run(self._find, codec, prop, value)
 
+    def _find(self, codec, prop, value):
         cursor = self.conn.cursor()
-        cursor.execute('SELECT {} FROM {} WHERE property = ? AND value = ?'.format(self.keys[0], self.table), (prop, value))
+        cursor.execute(self.lookup("find", codec), (prop, value))
         return [value[0] for value in cursor.fetchall()]
 
+    async def find_all(self, prop):
+        """
+        Retrieve every non-empty value of a property with a single query.
+        Returns a dictionary {key: value}, where key is a tuple of the keys for tables with multiple keys.
+        """
+        codec = self.prop_codec(prop)
+        prop = self.map_prop(prop)
+        rows = await self.executor.run(self._find_all, codec, prop)
+
+        values = {}
+        for row in rows:
+            value = codec.decode(row[-1])
+            if value is not None:
+                values[row[0] if len(self.keys) == 1 else tuple(row[:-1])] = value
+        return values
+
+    def _find_all(self, codec, prop):
+        cursor = self.conn.cursor()
+        cursor.execute(self.lookup("find_all", codec), (prop,))
+        return cursor.fetchall()
+
     async def find_not_empty(self, prop):
         if len(self.keys) > 1:
             raise Exception("This method cannot currently be used when there are multiple keys")
+        codec = self.prop_codec(prop)
         prop = self.map_prop(prop)
 
+        return await self.executor.run(self._find_not_empty, codec, prop)
+
+    def _find_not_empty(self, codec, prop):
         cursor = self.conn.cursor()
-        cursor.execute('SELECT {} FROM {} WHERE property = ? AND value IS NOT NULL AND value != \'\''.format(self.keys[0], self.table), (prop,))
+        cursor.execute(self.lookup("find_not_empty", codec), (prop,))
         return [value[0] for value in cursor.fetchall()]
+
+    def explain_lookups(self):
+        """
+        Check the query plan of each property-first lookup.
+        Returns a list of (lookup, indexed, plan) tuples.
+        Runs on the executor thread.
+        """
+        results = []
+        cursor = self.conn.cursor()
+        for name, sql in self.lookups.items():
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, ("",) * sql.count("?"))
+            plan = "; ".join(row[-1] for row in cursor.fetchall())
+            # Full table scans show as "SCAN <table>", index scans as "SCAN <table> USING [COVERING] INDEX"
+            indexed = all("USING" in step for step in plan.split("; ") if step.startswith("SCAN"))
+            results.append((name, indexed, plan))
+        return results
+
+
+class _historyTableManipulator:
+    """
+    Append-only store of timestamped property values, such as name histories and transaction logs.
+    Each append is a single insert, and the oldest rows past a property's retention are pruned periodically.
+    """
+    def __init__(self, table, keys, data, app):
+        self.table = table
+        self.keys = keys
+        self.data = data
+        self.conn = data.conn
+        self.app = app
+        self.executor = data.executor
+
+        self.props = {}  # Declared properties, {prop: (shared, retention)}
+        self.prune_counts = LRUCache(10000)  # Appends since the last prune, keyed by (keys..., mapped property)
+
+        self.executor.call(self.ensure_tables)
+
+    def ensure_tables(self):
+        cursor = self.conn.cursor()
+        keys = ", ".join("{} INTEGER NOT NULL".format(key) for key in self.keys)
+        cursor.execute('CREATE TABLE IF NOT EXISTS {} (id INTEGER PRIMARY KEY AUTOINCREMENT, {}, property TEXT NOT NULL, timestamp REAL NOT NULL, value TEXT)'.format(self.table, keys))
+        cursor.execute('CREATE INDEX IF NOT EXISTS {0}_key_timestamp ON {0} ({1}, property, timestamp)'.format(self.table, ", ".join(self.keys)))
+        self.conn.commit()
+
+    def ensure_exists(self, *props, shared=True, retention=None):
+        """
+        Declare the given properties, whether they are shared between apps,
+        and the number of most recent entries kept for each key, or None to keep every entry.
+        """
+        for prop in props:
+            self.props[prop] = (shared, retention)
+
+    def map_prop(self, prop):
+        return "{}_{}".format(self.app, prop) if (prop in self.props and not self.props[prop][0] and self.app) else prop
+
+    async def append(self, *args, timestamp=None):
+        """
+        Append a value to the history of a property.
+            await bot.data.users_history.append(userid, "name_history", name)
+        timestamp defaults to the current time.
+        """
+        if len(args) != len(self.keys) + 2:
+            raise Exception("Improper number of keys passed to append.")
+        await self.append_many(*args[:-1], [args[-1]], timestamp=timestamp)
+
+    async def append_many(self, *args, timestamp=None):
+        """
+        Append several values to the history of a property at once, in the order given.
+        The last argument is the list of values.
+        """
+        if len(args) != len(self.keys) + 2:
+            raise Exception("Improper number of keys passed to append_many.")
+        keys = args[:-2]
+        prop = args[-2]
+        mapped = self.map_prop(prop)
+        timestamp = timestamp if timestamp is not None else time.time()
+        rows = [(*keys, mapped, timestamp, json.dumps(value)) for value in args[-1]]
+
+        retention = self.props.get(prop, (True, None))[1]
+        prune = False
+        if retention is not None:
+            key = cache_key(keys, mapped)
+            count = self.prune_counts.get(key, 0) + len(rows)
+            # Prune once a quarter of the retention has been appended, so pruning stays off the common path
+            prune = count >= max(1, retention // 4)
+            self.prune_counts[key] = 0 if prune else count
+
+        await self.executor.run(self._append, keys, mapped, rows, retention if prune else None)
+        self.data.wrote()
+
+    def _append(self, keys, prop, rows, retention):
+        columns = ", ".join([*self.keys, "property", "timestamp", "value"])
+        values = ", ".join("?" for column in [*self.keys, "property", "timestamp", "value"])
+
+        cursor = self.conn.cursor()
+        try:
+            cursor.executemany('INSERT INTO {} ({}) VALUES ({})'.format(self.table, columns, values), rows)
+            if retention is not None:
+                criteria = " AND ".join("{} = ?".format(key) for key in [*self.keys, "property"])
+                cursor.execute('DELETE FROM {0} WHERE {1} AND id < (SELECT id FROM {0} WHERE {1} ORDER BY timestamp DESC, id DESC LIMIT 1 OFFSET ?)'.format(self.table, criteria),
+                               (*keys, prop, *keys, prop, retention - 1))
+        except Exception:
+            self.data.rollback()
+            raise
+        self.data.commit()
+
+    async def latest(self, *args, count=None, distinct=False):
+        """
+        Retrieve the most recent entries in the history of a property.
+        Returns a list of (timestamp, value) pairs, oldest first, of at most count entries.
+        With distinct, repeated values are only returned once, at their most recent position.
+        """
+        if len(args) != len(self.keys) + 1:
+            raise Exception("Improper number of keys passed to latest.")
+        rows = await self.executor.run(self._latest, args[:-1], self.map_prop(args[-1]), count, distinct)
+        return [(timestamp, json.loads(value)) for timestamp, value in reversed(rows)]
+
+    def _latest(self, keys, prop, count, distinct):
+        criteria = " AND ".join("{} = ?".format(key) for key in [*self.keys, "property"])
+        limit = " LIMIT {}".format(int(count)) if count is not None else ""
+
+        cursor = self.conn.cursor()
+        if distinct:
+            cursor.execute('SELECT MAX(timestamp) AS ts, value FROM {} WHERE {} GROUP BY value ORDER BY ts DESC, MAX(id) DESC{}'.format(self.table, criteria, limit),
+                           (*keys, prop))
+        else:
+            cursor.execute('SELECT timestamp, value FROM {} WHERE {} ORDER BY timestamp DESC, id DESC{}'.format(self.table, criteria, limit),
+                           (*keys, prop))
+        return cursor.fetchall()
+
+    async def clear(self, *args):
+        """
+        Remove the whole history of a property.
+        """
+        if len(args) != len(self.keys) + 1:
+            raise Exception("Improper number of keys passed to clear.")
+        await self.executor.run(self._clear, args[:-1], self.map_prop(args[-1]))
+        self.data.wrote()
+
+    def _clear(self, keys, prop):
+        criteria = " AND ".join("{} = ?".format(key) for key in [*self.keys, "property"])
+
+        cursor = self.conn.cursor()
+        cursor.execute('DELETE FROM {} WHERE {}'.format(self.table, criteria), (*keys, prop))
+        self.data.commit()
@@ -0,0 +1,75 @@
+"""
+Cache of resolved channel permissions, shared by the modules checking permissions in hot paths.
+
+Permissions are cached per (channel, member), grouped by server, and invalidated by the
+channel, role, member and server events which may change them, see global_events/permission_invalidation.py.
+The whole cache is cleared once it holds size entries.
+"""
+
+
+class PermissionCache:
+    def __init__(self, size=100000):
+        self.size = size
+        self.servers = {}  # Cached permissions, as {serverid: {channelid: {memberid: permissions}}}
+        self.count = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def permissions_for(self, channel, member):
+        """
+        Returns the permissions of the given member in the given channel, as channel.permissions_for(member).
+        """
+        if channel.is_private:
+            return channel.permissions_for(member)
+        channels = self.servers.get(channel.server.id, None)
+        members = channels.get(channel.id, None) if channels is not None else None
+        if members is not None and member.id in members:
+            self.hits += 1
+            return members[member.id]
+
+        self.misses += 1
+        permissions = channel.permissions_for(member)
+        if self.count >= self.size:
+            self.clear()
+        self.servers.setdefault(channel.server.id, {}).setdefault(channel.id, {})[member.id] = permissions
+        self.count += 1
+        return permissions
+
+    def can_read(self, channel, member):
+        """
+        Returns whether the given member can read the given channel.
+        """
+        return self.permissions_for(channel, member).read_messages
+
+    def clear(self):
+        self.servers = {}
+        self.count = 0
+
+    def invalidate_server(self, serverid):
+        channels = self.servers.pop(serverid, None)
+        if channels is not None:
+            self.count -= sum(len(members) for members in channels.values())
+            self.invalidations += 1
+
+    def invalidate_channel(self, serverid, channelid):
+        members = self.servers.get(serverid, {}).pop(channelid, None)
+        if members is not None:
+            self.count -= len(members)
+            self.invalidations += 1
+
+    def invalidate_member(self, serverid, memberid):
+        for members in self.servers.get(serverid, {}).values():
+            if members.pop(memberid, None) is not None:
+                self.count -= 1
+        self.invalidations += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"size": self.count,
+                "maxsize": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0,
+                "invalidations": self.invalidations}
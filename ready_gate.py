@@ -0,0 +1,50 @@
+import asyncio
+from collections import deque
+
+"""
+Readiness gate opened once the bot has finished loading at ready.
+
+Commands arriving during warm-up wait on the gate, and message listeners defer themselves
+into a bounded backlog which is replayed when the gate opens.
+"""
+
+
+class ReadyGate:
+    def __init__(self, backlog=500):
+        self.event = asyncio.Event()
+        self.backlog = deque(maxlen=backlog)
+
+        self.deferred = 0
+        self.dropped = 0
+
+    def is_ready(self):
+        return self.event.is_set()
+
+    async def wait(self):
+        """
+        Wait until the gate is opened.
+        """
+        await self.event.wait()
+
+    def defer(self, func, *args):
+        """
+        Queue func(*args) to be run when the gate opens.
+        The oldest queued call is dropped when the backlog is full.
+        Returns False if the gate is already open, in which case nothing is queued.
+        """
+        if self.event.is_set():
+            return False
+        if len(self.backlog) == self.backlog.maxlen:
+            self.dropped += 1
+        self.backlog.append((func, args))
+        self.deferred += 1
+        return True
+
+    def open(self):
+        """
+        Open the gate, waking the waiting commands and replaying the queued calls in order.
+        """
+        self.event.set()
+        while self.backlog:
+            func, args = self.backlog.popleft()
+            asyncio.ensure_future(func(*args))
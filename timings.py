@@ -0,0 +1,76 @@
+import time
+import functools
+from collections import deque
+
+from paradata_executor import percentile
+
+"""
+Timing instrumentation for the message dispatch pipeline.
+
+Stages are timed with
+    start = timings.start()
+    ...
+    timings.stop(stage, name, start)
+and the durations of the most recent calls of each (stage, name) pair are kept for percentile reports.
+While disabled start returns None and stop returns immediately, so the instrumentation costs almost nothing.
+"""
+
+
+class Timings:
+    def __init__(self, enabled=False, window=1000):
+        self.enabled = enabled
+        self.window = window
+
+        self.samples = {}  # Recent durations in seconds, indexed by (stage, name)
+        self.counts = {}  # Total number of calls timed, indexed by (stage, name)
+
+    def start(self):
+        return time.monotonic() if self.enabled else None
+
+    def stop(self, stage, name, start):
+        if start is None:
+            return
+        key = (stage, name)
+        if key not in self.samples:
+            self.samples[key] = deque(maxlen=self.window)
+            self.counts[key] = 0
+        self.samples[key].append(time.monotonic() - start)
+        self.counts[key] += 1
+
+    def reset(self):
+        self.samples = {}
+        self.counts = {}
+
+    def stats(self):
+        """
+        Returns a dictionary indexed by (stage, name) of the call counts and recent percentiles, with times in milliseconds.
+        """
+        stats = {}
+        for key, samples in list(self.samples.items()):
+            samples = list(samples)
+            stats[key] = {"count": self.counts[key],
+                          "p50": 1000 * percentile(samples, 50),
+                          "p95": 1000 * percentile(samples, 95),
+                          "p99": 1000 * percentile(samples, 99),
+                          "max": 1000 * max(samples)}
+        return stats
+
+
+def timed(stage, name=None):
+    """
+    Decorator timing a coroutine function taking the context as its first argument.
+    The name defaults to the name of the function.
+    """
+    def decorator(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(ctx, *args, **kwargs):
+            timings = ctx.bot.objects["timings"]
+            start = timings.start()
+            try:
+                return await func(ctx, *args, **kwargs)
+            finally:
+                timings.stop(stage, label, start)
+        return wrapper
+    return decorator
@@ -5,6 +5,9 @@ import discord
 import re
 import iso8601
 
+from flag_parser import get_parser
+from checks import has_tier, permission_levels
+
 
 def load_into(bot):
 
@@ -88,83 +91,9 @@ def load_into(bot):
             False if a flag isn't present,
             the value of the flag for a long flag,
         If -- is present in the input as a word, all flags afterwards are ignored.
-        TODO: Make this more efficient
+        The parser for each flag specification is compiled once and reused, see flag_parser.
         """
-        # Split across whitespace, keeping the whitespace
-        params = re.split(r'(\S+)', args)
-
-        final_params = []  # Final list of command parameters, excluding flags and flag arguments
-        final_flags = {}  # Dictionary of flags and flag values
-        indexes = []  # Indices in the params list where the flags appear
-        end_params = []  # The tail of the parameter list, after -- appears
-
-        # Handle appearence of the flag terminator
-        if "--" in params:
-            i = params.index('--')
-            end_params = params[i + 1:] if i < len(params) - 1 else []
-            params = params[:i]
-
-        # Find the param indicies of the flags
-        for flag in flags:
-            clean_flag = flag.strip("=")
-
-            if ("-" + clean_flag) in params:
-                index = params.index("-" + clean_flag)
-            elif ("--" + clean_flag) in params:
-                index = params.index("--" + clean_flag)
-            elif ("—" + clean_flag) in params:
-                index = params.index("—" + clean_flag)
-            else:
-                final_flags[clean_flag] = False
-                continue
-            indexes.append((index, flag))
-
-        # Sort the indicies to ensure we step through the flags in order of appearance
-        indexes = sorted(indexes)
-
-        # Add any parameters that appear before the first flag
-        if len(indexes) > 0:
-            final_params = params[0:indexes[0][0]]
-        else:
-            final_params = params
-
-        # Build the parameters and flag arguments
-        for (i, (index, flag)) in enumerate(indexes):
-            # Get the parameters between this flag and the next, or the end
-            if len(params) > index + 1:
-                if len(indexes) > i + 1:
-                    flag_params = params[index + 1:indexes[i + 1][0]]
-                else:
-                    flag_params = params[index + 1:]
-            else:
-                flag_params = []
-
-            # Split these into flag arguments and final parameters depending on flag type
-            if flag.endswith('=='):
-                flag_arg = ''.join(flag_params).strip()
-            elif flag.endswith('='):
-                # Find the first non-whitespace param, if it exists
-                j, arg = next(((j, arg) for j, arg in enumerate(flag_params) if arg.strip()), (len(flag_params), None))
-
-                flag_arg = arg or ''
-
-                # If there are any more params, add them to the final bunch
-                if len(flag_params) > j + 1:
-                    final_params.append(''.join(flag_params[j+1:]).rstrip())
-            else:
-                flag_arg = True
-                final_params.append(''.join(flag_params).rstrip())
-
-            # Set the flag arguments
-            final_flags[flag.strip('=')] = flag_arg
-
-        # Add any tail parameters
-        final_params += end_params
-
-        # Turn the parameter list into what we usually use, i.e. space split, and make the args
-        final_args = ''.join(final_params).strip()
-        final_params = final_args.split(' ')
-        return (final_params, final_args, final_flags)
+        return get_parser(flags).parse(args)
 
     @bot.util
     async def emb_add_fields(ctx, embed, emb_fields):
@@ -329,19 +258,19 @@ def load_into(bot):
 
     @bot.util
     def is_master(ctx, user):
-        return int(user.id) in ctx.bot.bot_conf.getintlist("masters")
+        return has_tier(ctx, user.id, "master")
 
     @bot.util
     def is_exec(ctx, user):
-        return ctx.is_master(user) or (int(user.id) in ctx.bot.bot_conf.getintlist("execWhiteList"))
+        return has_tier(ctx, user.id, "exec")
 
     @bot.util
     def is_dev(ctx, user):
-        return ctx.is_exec(user) or (int(user.id) in ctx.bot.bot_conf.getintlist("developers"))
+        return has_tier(ctx, user.id, "dev")
 
     @bot.util
     def is_manager(ctx, user):
-        return ctx.is_dev(user) or (int(user.id) in ctx.bot.bot_conf.getintlist("managers"))
+        return not permission_levels(ctx.bot.bot_conf).get(int(user.id), frozenset()).isdisjoint(("dev", "manager"))
 
     @bot.util
     async def offer_delete(ctx, out_msg, to_delete=None):
@@ -440,3 +369,17 @@ def load_into(bot):
             blocks = ["```{}\n{}\n```".format(syntax, block) for block in blocks]
 
         return blocks
+
+    @bot.util
+    def permissions_in(ctx, channel, member):
+        """
+        Returns the permissions of member in channel, through the shared permission cache.
+        """
+        return ctx.bot.objects["permission_cache"].permissions_for(channel, member)
+
+    @bot.util
+    def can_read(ctx, channel, member):
+        """
+        Returns whether member can read channel, through the shared permission cache.
+        """
+        return ctx.bot.objects["permission_cache"].can_read(channel, member)